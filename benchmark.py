@@ -0,0 +1,252 @@
+"""Benchmark funkcji danych aplikacji bez sieci i bez produkcyjnego arkusza.
+
+Arkusz Google zastępuje FakeArkusz z tests/atrapy.py (w pamięci, to samo API
+gspread, którego używa pakiet budzet), a wyciągi ING / mBank są generowane.
+Dla każdego rozmiaru danych mierzy czas (mediana z powtórzeń), szczyt pamięci
+(tracemalloc) i liczbę zapytań do "API" każdej operacji.
+
+    python benchmark.py                      # 1k, 10k, 100k wierszy
+    python benchmark.py --rozmiary 1000 --powtorzenia 5 --json wyniki.json
+"""
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import budzet.arkusz
+from budzet import agregacje, importy, magazyn, schemat, statystyki, wyszukiwanie
+from tests.atrapy import FakeArkusz, FakeKlient
+
+
+# ------------------------------------------------------------------
+# Dane syntetyczne
+# ------------------------------------------------------------------
+
+KONTRAHENCI = [
+    "ŻABKA Z{n} WARSZAWA", "BIEDRONKA {n} KRAKÓW", "ORLEN STACJA NR {n}", "LIDL {n} GDAŃSK",
+    "NETFLIX.COM {n}", "UBER *TRIP {n}", "APTEKA GEMINI {n}", "PRZELEW OD JAN KOWALSKI {n}",
+]
+
+
+def _losowe_transakcje(liczba, ziarno):
+    rng = random.Random(ziarno)
+    start = datetime.date(2022, 1, 1)
+    for _ in range(liczba):
+        data = start + datetime.timedelta(days=rng.randrange(3 * 365))
+        opis = rng.choice(KONTRAHENCI).format(n=rng.randrange(1000))
+        kwota = round(rng.uniform(-500, 300), 2)
+        yield data, opis, kwota, rng
+
+
+def _kwota_pl(kwota):
+    return f"{kwota:.2f}".replace(".", ",")
+
+
+def wyciag_ing(liczba, ziarno=1):
+    """Plik CSV w formacie ING (cp1250, 19 wierszy nagłówka, stopka z saldem)."""
+    linie = [f'"Lista transakcji";"wiersz {i}"' for i in range(19)]
+    linie.append(
+        "Data transakcji;Data księgowania;Dane kontrahenta;Tytuł;Nr rachunku;"
+        "Szczegóły;Kwota transakcji (waluta rachunku);Waluta"
+    )
+    for data, opis, kwota, _ in _losowe_transakcje(liczba, ziarno):
+        linie.append(f'{data:%Y-%m-%d};{data:%Y-%m-%d};"{opis}";"Płatność";"";"";{_kwota_pl(kwota)};PLN')
+    linie.append(';;;;;"Saldo końcowe";0,00;PLN')
+    return io.BytesIO("\n".join(linie).encode("cp1250"))
+
+
+def wyciag_mbank(liczba, kategorie, ziarno=2):
+    """Plik CSV w formacie mBank (utf-8, 25 wierszy nagłówka, kwoty z "PLN")."""
+    linie = [f"#mBank;wiersz {i}" for i in range(25)]
+    linie.append("#Data operacji;#Opis operacji;#Rachunek;#Kategoria;#Kwota;")
+    for data, opis, kwota, rng in _losowe_transakcje(liczba, ziarno):
+        kwota = f"{_kwota_pl(kwota)} PLN"
+        linie.append(f'{data:%Y-%m-%d};"{opis}";"eKonto";"{rng.choice(kategorie)}";{kwota};')
+    linie.append("")
+    linie.append("#Saldo końcowe;;;;0,00 PLN;")
+    return io.BytesIO("\n".join(linie).encode("utf-8"))
+
+
+def arkusz_startowy(liczba, ziarno=3):
+    """Wiersze arkusza "dane" (z nagłówkiem KOLUMNY)."""
+    wiersze = [list(schemat.KOLUMNY)]
+    for i, (data, opis, kwota, rng) in enumerate(_losowe_transakcje(liczba, ziarno), start=1):
+        bank = rng.choice(schemat.LISTA_BANKOW)
+        opis = f"ING {opis}" if bank == "ING" else opis
+        wiersze.append([i, f"{data:%Y-%m-%d}", rng.choice(schemat.LISTA_KATEGORII), opis, kwota, bank])
+    return wiersze
+
+
+# ------------------------------------------------------------------
+# Pomiary
+# ------------------------------------------------------------------
+
+def zmierz(nazwa, funkcja, arkusz, powtorzenia, przygotuj=None):
+    """Mediana czasu z `powtorzenia` przebiegów, szczyt pamięci i liczba zapytań (z ostatniego przebiegu)."""
+    czasy = []
+    for _ in range(powtorzenia):
+        argumenty = przygotuj() if przygotuj else ()
+        arkusz.zapytania.clear()
+        start = time.perf_counter()
+        funkcja(*argumenty)
+        czasy.append(time.perf_counter() - start)
+    zapytania = list(arkusz.zapytania)
+
+    # Pamięć osobno - tracemalloc spowalnia, więc nie psuje pomiaru czasu
+    argumenty = przygotuj() if przygotuj else ()
+    tracemalloc.start()
+    funkcja(*argumenty)
+    _, szczyt = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'operacja': nazwa,
+        'czas_ms': round(statistics.median(czasy) * 1000, 2),
+        'pamiec_mb': round(szczyt / 2 ** 20, 2),
+        'zapytania_api': len(zapytania),
+        'api': ", ".join(f"{z}×{zapytania.count(z)}" for z in dict.fromkeys(zapytania)),
+    }
+
+
+def poczekaj_na_zapis():
+    kolejka = magazyn.get_kolejka_zapisu()
+    while kolejka.zadania:
+        time.sleep(0.001)
+    if kolejka.nieudane:
+        raise RuntimeError(kolejka.nieudane[-1][1])
+
+
+def benchmark(rozmiar, powtorzenia, katalog):
+    """Wszystkie operacje dla danych o `rozmiar` wierszach."""
+    # Świeży stan: nowe lustro, kolejka, połączenie i puste cache
+    magazyn.zamknij_zasoby()
+    for zasob in (budzet.arkusz.get_polaczenie, magazyn.licznik_id, magazyn.migawka_danych, *magazyn.WIDOKI_WERSJI):
+        zasob.clear()
+    magazyn.LUSTRO_SCIEZKA = os.path.join(katalog, f"lustro_{rozmiar}.sqlite")
+
+    arkusz = FakeArkusz(arkusz_startowy(rozmiar))
+    klient = FakeKlient(arkusz)
+    budzet.arkusz.get_gspread_client = lambda: klient
+    wyniki = []
+
+    def dodaj(nazwa, funkcja, przygotuj=None, powtorzen=powtorzenia):
+        wyniki.append({'rozmiar': rozmiar, **zmierz(nazwa, funkcja, arkusz, powtorzen, przygotuj)})
+
+    # --- Odczyt ---
+    def zimne_lustro():
+        if os.path.exists(magazyn.LUSTRO_SCIEZKA):
+            os.remove(magazyn.LUSTRO_SCIEZKA)
+        magazyn.zamknij_zasoby()
+        magazyn.migawka_danych.clear()
+        return ()
+    dodaj("pobierz_dane (pierwsze, z arkusza)", magazyn.pobierz_dane, przygotuj=zimne_lustro, powtorzen=1)
+    dodaj("pobierz_dane (z cache)", magazyn.pobierz_dane)
+    dodaj("pobierz_dane (z lustra)", magazyn.pobierz_dane, przygotuj=lambda: magazyn.migawka_danych.clear() or ())
+    df, wersja = magazyn.dane_strony()
+
+    # --- Import ---
+    dodaj("przetworz_csv ING", importy.przetworz_csv, przygotuj=lambda: (wyciag_ing(rozmiar),))
+    dodaj("przetworz_csv mBank", importy.przetworz_csv,
+          przygotuj=lambda: (wyciag_mbank(rozmiar, schemat.LISTA_KATEGORII),))
+    kwoty = pd.Series([f"{k:.2f}".replace(".", ",") + " PLN" for k in np.random.default_rng(0).uniform(-999, 999, rozmiar)])
+    dodaj("wyczysc_kwoty (wektorowo)", lambda: schemat.wyczysc_kwoty(kwoty))
+    import_ing = importy.przetworz_csv(wyciag_ing(rozmiar))
+    dodaj("oznacz_duplikaty", lambda: importy.oznacz_duplikaty(import_ing, magazyn.wczytaj_odciski(wersja)))
+    dodaj("reguły kategorii: nauka", lambda: importy.RegulyKategorii(df))
+    reguly = importy.RegulyKategorii(df)
+    dodaj("reguły kategorii: przypisz", lambda: reguly.przypisz(import_ing))
+
+    # --- Filtry i agregacje stron ---
+    indeks = magazyn.wczytaj_indeks_dat(wersja)
+    kostka = magazyn.wczytaj_kostke(wersja)
+    zakres = (datetime.date(2023, 3, 15), datetime.date(2024, 2, 10))
+    wykluczone = ['Nieistotne', 'Bez kategorii', 'Regularne oszczędzanie']
+
+    def tabela_danych():
+        filtr = agregacje.FiltrTransakcji(df, indeks).okres(zakres).kategorie(["Paliwo", "Rozrywka"])
+        return filtr.banki(["ING"]).wynik(malejaco=True)
+    dodaj("Tabela danych: filtry", tabela_danych)
+    dodaj("IndeksDat (budowa)", lambda: agregacje.IndeksDat(df['data']))
+    dodaj("Wydatki w czasie: zsumuj_wydatki",
+          lambda: agregacje.zsumuj_wydatki(df, kostka, zakres, wykluczone, [], 'miesiac', indeks))
+    dodaj("Wydatki wg kategorii: zsumuj_wydatki",
+          lambda: agregacje.zsumuj_wydatki(df, kostka, zakres, wykluczone, [], 'kategoria', indeks))
+    dodaj("kostka_wydatkow (pełna)", lambda: agregacje.kostka_wydatkow(df))
+
+    # --- Trendy: statystyki z kostki, aktualizacja po nowej transakcji z ostatniego miesiąca ---
+    dodaj("StatystykiWydatkow (budowa)", lambda: statystyki.StatystykiWydatkow(kostka))
+    stat = statystyki.StatystykiWydatkow(kostka)
+    ostatni = kostka['miesiac'] == kostka['miesiac'].max()
+    kostka_po_dopisaniu = kostka.assign(suma=kostka['suma'].where(~ostatni, kostka['suma'] - 10.0))
+    dodaj("StatystykiWydatkow (aktualizacja ostatniego miesiąca)",
+          lambda: statystyki.StatystykiWydatkow(kostka_po_dopisaniu, stat))
+    dodaj("Trendy: seria + prognoza", lambda: (stat.seria(), stat.prognoza(datetime.date.today())))
+
+    # --- Wyszukiwanie po opisie ---
+    dodaj("IndeksOpisow (budowa)", lambda: wyszukiwanie.IndeksOpisow(df))
+    indeks_opisow = wyszukiwanie.IndeksOpisow(df)
+    po_edycji = df.assign(opis=df['opis'].where(df.index % 100 != 0, "Nowy opis sklepu"))
+    dodaj("IndeksOpisow (aktualizacja po zmianie 1%)", lambda: wyszukiwanie.IndeksOpisow(po_edycji, indeks_opisow))
+    dodaj("szukaj w opisie (indeks)", lambda: indeks_opisow.szukaj("zabka z12"))
+    dodaj("szukaj w opisie (str.contains)",
+          lambda: df['opis'].str.contains("żabka", case=False) & df['opis'].str.contains("z12", case=False))
+
+    # --- Zapis (przez kolejkę, aż arkusz i lustro dostaną zmiany) ---
+    def edycja():
+        baza = magazyn.pobierz_dane()
+        zmienione = baza.copy()
+        wybrane = zmienione.sample(max(1, rozmiar // 100), random_state=len(arkusz.wiersze)).index
+        zmienione.loc[wybrane, 'opis'] = zmienione.loc[wybrane, 'opis'].astype(str) + " *"
+        return zmienione, baza
+
+    def zapisz(zmienione, baza):
+        magazyn.zapisz_calosc(zmienione, df_bazowy=baza)
+        poczekaj_na_zapis()
+    dodaj("zapisz_calosc (1% wierszy, delta)", zapisz, przygotuj=edycja)
+
+    def nowe_wiersze():
+        return (importy.przetworz_csv(wyciag_ing(100, ziarno=random.randrange(10 ** 6))),)
+
+    def dopisz(df_nowe):
+        magazyn.dopisz_wiersze(df_nowe)
+        poczekaj_na_zapis()
+    dodaj("dopisz_wiersze (100 wierszy)", dopisz, przygotuj=nowe_wiersze)
+
+    return wyniki
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rozmiary", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--powtorzenia", type=int, default=3)
+    parser.add_argument("--json", help="zapisz wyniki do pliku JSON")
+    args = parser.parse_args()
+
+    # Poza `streamlit run` cache Streamlit ostrzega przy każdym wywołaniu
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    wyniki = []
+    with tempfile.TemporaryDirectory() as katalog:
+        for rozmiar in args.rozmiary:
+            wyniki.extend(benchmark(rozmiar, args.powtorzenia, katalog))
+
+    tabela = pd.DataFrame(wyniki)
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.max_colwidth', 60):
+        print(tabela.to_string(index=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as plik:
+            json.dump(wyniki, plik, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""Warstwa danych budżetu - bez interfejsu, do użycia ze stron Streamlit i ze skryptów.
+
+- schemat: kolumny, słowniki kategorii i banków, normalizacja wartości
+- arkusz: połączenie z Google Sheets
+- magazyn: lokalne lustro arkusza, cache odczytów i kolejka zapisów
+- importy: wyciągi CSV, duplikaty, reguły kategorii
+- agregacje: kostka wydatków, indeks dat, sumy do wykresów
+- statystyki: średnie kroczące, zmiany m/m, prognoza i budżet miesiąca
+- edytor: stronicowane st.data_editor
+- pomiary: czasy operacji i zapytań do API
+"""
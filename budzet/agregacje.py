@@ -0,0 +1,204 @@
+"""Agregacje i filtry: kostka miesiąc × kategoria × bank, indeks dat, sumy do wykresów."""
+import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from budzet.pomiary import mierzone
+from budzet.schemat import jako_tekst, na_grosze
+
+
+KLUCZ_KOSTKI = ['miesiac', 'kategoria', 'bank']
+
+
+@mierzone("kostka_wydatkow")
+def kostka_wydatkow(df, w_groszach=False):
+    """Agreguje transakcje do kostki miesiąc × kategoria × bank -> suma, liczba.
+
+    Sumujemy grosze (int64), więc suma jest dokładna; w złotych zwracamy ją
+    tylko na wyjściu, chyba że `w_groszach` (tak trzyma ją lustro).
+    """
+    klucze = pd.DataFrame({
+        'miesiac': pd.to_datetime(df['data'], errors='coerce').dt.strftime('%Y-%m').fillna(""),
+        'kategoria': jako_tekst(df['kategoria']),
+        'bank': jako_tekst(df['bank']),
+        'grosze': na_grosze(df['kwota']),
+    })
+    kostka = klucze.groupby(KLUCZ_KOSTKI, as_index=False).agg(
+        suma=('grosze', 'sum'), liczba=('grosze', 'size')
+    )
+    if not w_groszach:
+        kostka['suma'] = kostka['suma'] / 100
+    return kostka
+
+
+def zakres_z_wyboru(date_range):
+    """Zamienia wynik st.date_input na (od, do) albo None, gdy zakres nie jest wybrany."""
+    if isinstance(date_range, tuple):
+        if len(date_range) == 2:
+            return date_range[0], date_range[1]
+        if len(date_range) == 1:
+            return date_range[0], date_range[0]
+    return None
+
+
+class IndeksDat:
+    """Posortowane numery dni transakcji + permutacja do pozycji wierszy w ramce.
+
+    Ramka zostaje w kolejności arkusza (na niej opiera się zapis delta),
+    a zakres dat wyznaczamy wyszukiwaniem binarnym (searchsorted) zamiast
+    porównywania obiektów `date` w każdym wierszu.
+    """
+
+    def __init__(self, daty):
+        dni = pd.to_datetime(daty, errors='coerce').to_numpy().astype('datetime64[D]').astype('int64')
+        self.kolejnosc = np.argsort(dni, kind='stable').astype('int32')
+        # Numery dni mieszczą się w int32; NaT zamieniamy na najmniejszą liczbę, więc nigdy nie trafia w zakres
+        self.dni = np.maximum(dni[self.kolejnosc], np.iinfo('int32').min).astype('int32')
+
+    def __len__(self):
+        return len(self.dni)
+
+    def pozycje(self, od, do):
+        """Pozycje (iloc) wierszy z dniami od `od` do `do` włącznie, rosnąco po dacie."""
+        # Granice jako int32 jak dni - inaczej searchsorted przepisałby całą tablicę do int64
+        od = np.datetime64(od, 'D').astype('int64').astype('int32')
+        do = np.datetime64(do, 'D').astype('int64').astype('int32')
+        poczatek = np.searchsorted(self.dni, od, side='left')
+        koniec = np.searchsorted(self.dni, do, side='right')
+        return self.kolejnosc[poczatek:koniec]
+
+
+def zakres_miesiaca(miesiac):
+    """'RRRR-MM' -> (pierwszy, ostatni dzień miesiąca)."""
+    okres = pd.Period(miesiac, 'M')
+    return okres.start_time.date(), okres.end_time.date()
+
+
+class FiltrTransakcji:
+    """Leniwe zapytanie o transakcje: filtry tylko się składa, a ramkę wycina raz, w wynik().
+
+    Zakres dat zawęża pozycje wyszukiwaniem binarnym w IndeksDat. Pozostałe
+    warunki łączą się w jedną maskę, liczoną tylko na kolumnach, których
+    dotyczą, i tylko dla wierszy z zakresu - bez kopii całej ramki po
+    każdym filtrze. Metody zwracają self, więc można je łączyć w łańcuch.
+    """
+
+    def __init__(self, df, indeks=None):
+        if indeks is None or len(indeks) != len(df):
+            indeks = IndeksDat(df['data'])
+        self.df = df
+        self.indeks = indeks
+        self.zakres = None
+        self.warunki = []   # (kolumna, funkcja: wartości kolumny -> maska)
+
+    def okres(self, zakres):
+        """Tylko transakcje z (od, do) włącznie; kolejne wywołania zawężają zakres. None nic nie zmienia."""
+        if zakres is not None:
+            od, do = zakres
+            if self.zakres is not None:
+                od, do = max(od, self.zakres[0]), min(do, self.zakres[1])
+            self.zakres = (od, do)
+        return self
+
+    def gdzie(self, kolumna, warunek):
+        """Dowolny warunek na jednej kolumnie, np. gdzie('kwota', lambda k: k < 0)."""
+        self.warunki.append((kolumna, warunek))
+        return self
+
+    def banki(self, banki):
+        return self.gdzie('bank', lambda bank: bank.isin(banki))
+
+    def bez_kategorii(self, wykluczone):
+        return self.gdzie('kategoria', lambda kategoria: ~kategoria.isin(wykluczone))
+
+    def kategorie(self, filtry_kat):
+        """Tylko wybrane kategorie (pusta lista - wszystkie)."""
+        if filtry_kat:
+            self.gdzie('kategoria', lambda kategoria: kategoria.isin(filtry_kat))
+        return self
+
+    def tylko_id(self, ids):
+        """Tylko transakcje o podanych ID (np. wynik wyszukiwania); None - bez ograniczeń."""
+        if ids is not None:
+            self.gdzie('id', lambda id_: np.isin(id_, ids))
+        return self
+
+    def pozycje(self):
+        """Pozycje (iloc) pasujących wierszy, rosnąco po dacie."""
+        if self.zakres is None:
+            pozycje = self.indeks.kolejnosc
+        else:
+            pozycje = self.indeks.pozycje(*self.zakres)
+        if self.warunki and len(pozycje):
+            maska = np.ones(len(pozycje), dtype=bool)
+            for kolumna, warunek in self.warunki:
+                maska &= np.asarray(warunek(self.df[kolumna].take(pozycje)), dtype=bool)
+            pozycje = pozycje[maska]
+        return pozycje
+
+    def wynik(self, kolumny=None, malejaco=False):
+        """Jedyne miejsce, gdzie powstaje nowa ramka: pasujące wiersze (opcjonalnie tylko `kolumny`) po dacie."""
+        pozycje = self.pozycje()
+        if malejaco:
+            pozycje = pozycje[::-1]
+        if kolumny is None:
+            return self.df.iloc[pozycje]
+        return self.df.iloc[pozycje, self.df.columns.get_indexer(kolumny)]
+
+
+def _podziel_na_miesiace(od, do):
+    """Dzieli zakres na pełne miesiące ('RRRR-MM' od, do) i okna brzegowe niepełnych miesięcy."""
+    pierwszy_pelny = od if od.day == 1 else od.replace(day=1) + relativedelta(months=1)
+    koniec_miesiaca = do.replace(day=1) + relativedelta(months=1) - datetime.timedelta(days=1)
+    ostatni_pelny = do if do == koniec_miesiaca else do.replace(day=1) - datetime.timedelta(days=1)
+
+    if pierwszy_pelny > ostatni_pelny:
+        return None, [(od, do)]
+
+    okna = []
+    if od < pierwszy_pelny:
+        okna.append((od, pierwszy_pelny - datetime.timedelta(days=1)))
+    if do > ostatni_pelny:
+        okna.append((ostatni_pelny + datetime.timedelta(days=1), do))
+    return (pierwszy_pelny.strftime('%Y-%m'), ostatni_pelny.strftime('%Y-%m')), okna
+
+
+@mierzone("zsumuj_wydatki")
+def zsumuj_wydatki(df, kostka, zakres, wykluczone, filtry_kat, wymiar, indeks=None):
+    """Sumy kwot wg `wymiar` ('miesiac' albo 'kategoria') dla wybranych filtrów.
+
+    Pełne miesiące bierzemy z kostki, a wiersze przeglądamy tylko dla
+    niepełnych miesięcy na brzegach zakresu dat.
+    """
+    kostka = kostka[(kostka['miesiac'] != "") & ~kostka['kategoria'].isin(wykluczone)]
+    if filtry_kat:
+        kostka = kostka[kostka['kategoria'].isin(filtry_kat)]
+
+    if zakres is None:
+        czesci = [kostka[[wymiar, 'suma']]]
+    else:
+        pelne, okna = _podziel_na_miesiace(*zakres)
+        czesci = []
+        if pelne is not None:
+            w_zakresie = kostka['miesiac'].between(*pelne)
+            czesci.append(kostka.loc[w_zakresie, [wymiar, 'suma']])
+        for od, do in okna:
+            wiersze = (
+                FiltrTransakcji(df, indeks).okres((od, do)).bez_kategorii(wykluczone).kategorie(filtry_kat)
+                .wynik(['data', 'kategoria', 'kwota'])
+            )
+            czesci.append(pd.DataFrame({
+                'miesiac': wiersze['data'].dt.strftime('%Y-%m'),
+                'kategoria': wiersze['kategoria'],
+                'suma': wiersze['kwota'],
+            })[[wymiar, 'suma']])
+
+    czesci = [c for c in czesci if not c.empty]
+    if not czesci:
+        return pd.DataFrame(columns=[wymiar, 'kwota'])
+    # Kostka i okna brzegowe sumujemy w groszach, żeby wynik był dokładny
+    wynik = pd.concat(czesci, ignore_index=True)
+    wynik = wynik.assign(suma=na_grosze(wynik['suma'])).groupby(wymiar)['suma'].sum() / 100
+    return wynik.reset_index().rename(columns={'suma': 'kwota'})
@@ -0,0 +1,85 @@
+"""Połączenie z arkuszem Google: klient gspread, uchwyty arkusza i zakładki."""
+import datetime
+import threading
+
+import gspread
+import streamlit as st
+from google.oauth2.service_account import Credentials
+
+from budzet.pomiary import get_pomiary
+
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+
+@st.cache_resource
+def get_gspread_client():
+    creds_dict = dict(st.secrets["gcp_service_account"])
+    creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
+    client = gspread.authorize(creds)
+    # Każda odpowiedź z Google API trafia do pomiarów (liczba zapytań, bajty, 429)
+    client.http_client.session.hooks['response'].append(get_pomiary().odpowiedz_api)
+    return client
+
+
+SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1GdbHX0mKbwyJhjmcG3jgtN9E8BJVSSunRYvfSLUjSIc/edit?usp=sharing"  # <--- WAŻNE: Wklej link!
+WORKSHEET_NAME = "dane"
+
+TOKEN_ZAPAS = datetime.timedelta(minutes=5)   # odświeżamy token, gdy do wygaśnięcia zostało mniej
+
+
+class PolaczenieArkusza:
+    """Otwarty arkusz i zakładka trzymane między odczytami i zapisami.
+
+    open_by_url i worksheet() to osobne zapytania o metadane, więc robimy je
+    raz i ponownie dopiero po błędzie (uniewaznij). Klient gspread trzyma
+    jedną sesję HTTP (AuthorizedSession, keep-alive) wspólną dla wszystkich
+    sesji i wątków, a token odświeżamy z wyprzedzeniem w wątku synchronizacji,
+    a nie w trakcie zapytania użytkownika.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._arkusz = None
+        self._zakladka = None
+
+    def arkusz(self):
+        with self._lock:
+            if self._arkusz is None:
+                self._arkusz = self.client.open_by_url(SPREADSHEET_URL)
+            return self._arkusz
+
+    def zakladka(self):
+        arkusz = self.arkusz()
+        with self._lock:
+            if self._zakladka is None:
+                self._zakladka = arkusz.worksheet(WORKSHEET_NAME)
+            return self._zakladka
+
+    def uniewaznij(self):
+        """Zapomina uchwyty - przy następnym użyciu zostaną otwarte od nowa."""
+        with self._lock:
+            self._arkusz = None
+            self._zakladka = None
+
+    def odswiez_token(self):
+        """Odświeża token dostępu, jeśli wygasł albo zaraz wygaśnie."""
+        http = self.client.http_client
+        wygasa = http.auth.expiry
+        if not http.auth.valid or (wygasa and wygasa - datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) < TOKEN_ZAPAS):
+            http.login()
+
+
+@st.cache_resource
+def get_polaczenie():
+    """Jedno połączenie z arkuszem na proces."""
+    return PolaczenieArkusza(get_gspread_client())
+
+
+def do_ponowienia(blad):
+    """Czy błąd jest przejściowy: limit zapytań (429) albo błąd serwera Google (5xx)."""
+    return isinstance(blad, gspread.exceptions.APIError) and (blad.code == 429 or blad.code >= 500)
@@ -0,0 +1,98 @@
+"""Tabele do edycji w przeglądarce: stronicowanie i zmiany z st.data_editor."""
+import pandas as pd
+import streamlit as st
+
+
+ROZMIAR_STRONY = 100   # tyle wierszy na raz trafia do przeglądarki w tabelach
+
+
+def stronicuj(df, klucz, rozmiar=ROZMIAR_STRONY):
+    """Wybór strony (UI) i wycinek `df` dla niej. Zwraca (numer strony od 0, wycinek)."""
+    liczba_stron = max(1, -(-len(df) // rozmiar))
+    klucz_strony = f"{klucz}_strona"
+    if st.session_state.get(klucz_strony, 1) > liczba_stron:
+        # Po zawężeniu filtrów strona mogła przestać istnieć
+        st.session_state[klucz_strony] = liczba_stron
+
+    nr = 0
+    if liczba_stron > 1:
+        nr = int(st.number_input(
+            f"Strona (z {liczba_stron})", min_value=1, max_value=liczba_stron, step=1, key=klucz_strony
+        )) - 1
+    poczatek = nr * rozmiar
+    koniec = min(poczatek + rozmiar, len(df))
+    if liczba_stron > 1:
+        st.caption(f"Wiersze {poczatek + 1}–{koniec} z {len(df)}")
+    return nr, df.iloc[poczatek:koniec]
+
+
+def edytor_stron(klucz, nr, df_strona, podpis, **parametry):
+    """st.data_editor dla jednej strony; zmiany każdej strony zostają w sesji aż do zapisu.
+
+    st.data_editor pamięta zmiany tylko względem swoich danych wejściowych i
+    tylko póki jest wyświetlany, więc po powrocie na stronę startuje od jej
+    ostatnio edytowanej wersji (pod nowym kluczem - `pokolenie`).
+    `podpis` opisuje filtry widoku: gdy się zmieni, strony są inne, a
+    niezapisane zmiany przepadają.
+    """
+    edycje = st.session_state.get(f"{klucz}_edycje")
+    if edycje is None or edycje['podpis'] != podpis:
+        edycje = st.session_state[f"{klucz}_edycje"] = {'podpis': podpis, 'strony': {}}
+    strony = edycje['strony']
+
+    for inna, e in strony.items():
+        if inna != nr and e['wejscie'] is not e['wynik']:
+            e['wejscie'] = e['wynik']
+            e['pokolenie'] += 1
+            e['zmieniane_wczesniej'] = e['zmieniane_wczesniej'] or e['zmieniane']
+
+    e = strony.get(nr) or {
+        'przed': df_strona, 'wejscie': df_strona, 'wynik': df_strona,
+        'pokolenie': 0, 'zmieniane': False, 'zmieniane_wczesniej': False,
+    }
+    klucz_widgetu = f"{klucz}_{nr}_{e['pokolenie']}"
+    wynik = st.data_editor(e['wejscie'], key=klucz_widgetu, **parametry)
+
+    stan = st.session_state.get(klucz_widgetu) or {}
+    ma_zmiany = bool(stan.get('edited_rows') or stan.get('deleted_rows') or stan.get('added_rows'))
+    if ma_zmiany or e['pokolenie'] > 0:
+        e['wynik'] = wynik
+        e['zmieniane'] = bool(stan.get('edited_rows') or stan.get('deleted_rows'))
+        strony[nr] = e
+    else:
+        strony.pop(nr, None)
+    return wynik
+
+
+def zmiany_stron(klucz):
+    """Niezapisane zmiany z edytor_stron: lista par (przed, po) dla kolejnych stron."""
+    edycje = st.session_state.get(f"{klucz}_edycje") or {'strony': {}}
+    return [(e['przed'], e['wynik']) for _, e in sorted(edycje['strony'].items())]
+
+
+def nowe_wiersze_stron(klucz):
+    """Nowe wiersze ze wszystkich stron, jeśli na żadnej nic nie zmieniono ani nie usunięto (inaczej None)."""
+    edycje = st.session_state.get(f"{klucz}_edycje") or {'strony': {}}
+    strony = edycje['strony'].values()
+    if not strony or any(e['zmieniane'] or e['zmieniane_wczesniej'] for e in strony):
+        return None
+    nowe = [e['wynik'][pd.to_numeric(e['wynik']['id'], errors='coerce').fillna(0) == 0] for e in strony]
+    return pd.concat(nowe, ignore_index=True)
+
+
+def odrzuc_zmiany_stron(klucz):
+    """Zapomina niezapisane zmiany ze wszystkich stron (po zapisie)."""
+    st.session_state.pop(f"{klucz}_edycje", None)
+
+
+def tylko_nowe_wiersze(klucz_edytora, df_edytowany):
+    """Nowe wiersze z st.data_editor, jeśli użytkownik wyłącznie dodawał wiersze.
+
+    Gdy cokolwiek zostało zmienione lub usunięte, zwraca None - wtedy
+    trzeba zapisać różnice przez zapisz_calosc.
+    """
+    stan = st.session_state.get(klucz_edytora) or {}
+    if stan.get('edited_rows') or stan.get('deleted_rows') or not stan.get('added_rows'):
+        return None
+    bez_id = pd.to_numeric(df_edytowany['id'], errors='coerce').fillna(0) == 0
+    return df_edytowany[bez_id]
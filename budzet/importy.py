@@ -0,0 +1,295 @@
+"""Import wyciągów bankowych (CSV), wykrywanie duplikatów i podpowiadanie kategorii."""
+import concurrent.futures
+import io
+import multiprocessing
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from budzet.magazyn import wczytaj_dane, widok_wersji
+from budzet.pomiary import mierz, mierzone
+from budzet.schemat import KATEGORIA_DOMYSLNA, TYP_OPISU, jako_tekst, na_grosze, odciski_transakcji, wyczysc_kwoty
+
+
+def oznacz_duplikaty(df_import, liczniki):
+    """Maska wierszy importu, które już są w bazie.
+
+    Liczy wystąpienia: jeśli baza ma 2 identyczne transakcje (np. dwie kawy
+    tego samego dnia), to z importu za duplikaty uznajemy tylko 2 pierwsze.
+    """
+    odciski = odciski_transakcji(df_import)
+    kolejne = odciski.groupby(odciski).cumcount()
+    w_bazie = odciski.map(liczniki).fillna(0).astype('int64')
+    return kolejne < w_bazie
+
+
+ROZMIAR_PACZKI_CSV = 5000          # tyle wierszy wyciągu przetwarzamy naraz
+ROZMIAR_NAGLOWKA_CSV = 64 * 1024   # tyle bajtów z początku pliku wystarcza, by rozpoznać bank
+KOLUMNY_IMPORTU = ['data', 'kategoria', 'opis', 'kwota']
+
+# nazwa banku -> opis formatu CSV + funkcja przetwarzająca jedną paczkę wierszy
+PARSERY_BANKOW = {}
+
+
+def parser_banku(nazwa, sygnatura, kodowanie, pomin_wierszy, kolumny):
+    """Dekorator rejestrujący parser wyciągu banku.
+
+    `sygnatura` to fragment nagłówka CSV, po którym rozpoznajemy bank,
+    `kolumny` mapuje nazwy kolumn banku na nasze (data, opis, kwota, ...).
+    Udekorowana funkcja dostaje paczkę wierszy z już przemianowanymi
+    kolumnami i zwraca ją w układzie KOLUMNY_IMPORTU.
+    """
+    def rejestruj(funkcja):
+        PARSERY_BANKOW[nazwa] = {
+            'sygnatura': sygnatura.encode(kodowanie),
+            'kodowanie': kodowanie,
+            'pomin_wierszy': pomin_wierszy,
+            'kolumny': kolumny,
+            'przetworz': funkcja,
+        }
+        return funkcja
+    return rejestruj
+
+
+@parser_banku(
+    "mBank", sygnatura="#Data operacji", kodowanie='utf-8', pomin_wierszy=25,
+    kolumny={'Data operacji': 'data', 'Opis operacji': 'opis', 'Kwota': 'kwota', 'Kategoria': 'kategoria'},
+)
+def _przetworz_mbank(dane):
+    dane['data'] = pd.to_datetime(dane['data'], errors='coerce')
+
+    dane['kwota'], bledne = wyczysc_kwoty(dane['kwota'])
+    dane.attrs['bledne_kwoty'] = dane.loc[bledne, 'opis'].tolist()
+
+    if 'kategoria' not in dane.columns: dane['kategoria'] = "Bez kategorii"
+    else: dane['kategoria'] = dane['kategoria'].fillna("Bez kategorii")
+
+    dane = dane.dropna(subset=['data'])
+    return dane[KOLUMNY_IMPORTU]
+
+
+@parser_banku(
+    "ING", sygnatura="Data transakcji", kodowanie='cp1250', pomin_wierszy=19,
+    kolumny={'Data transakcji': 'data', 'Dane kontrahenta': 'opis', 'Kwota transakcji (waluta rachunku)': 'kwota'},
+)
+def _przetworz_ing(dane):
+    dane['data'] = pd.to_datetime(dane['data'], errors='coerce')
+    dane = dane.dropna(subset=['data'])
+
+    dane['kategoria'] = "Bez kategorii"
+    dane["opis"] = "ING " + dane["opis"].fillna("")
+
+    dane['kwota'], bledne = wyczysc_kwoty(dane['kwota'])
+    dane.attrs['bledne_kwoty'] = dane.loc[bledne, 'opis'].tolist()
+    # Połowa kwoty, zaokrąglona do grosza - w arkuszu nie powinny lądować ułamki groszy
+    dane['kwota'] = na_grosze(dane['kwota'] / 2) / 100
+
+    return dane[KOLUMNY_IMPORTU]
+
+
+def rozpoznaj_bank(naglowek):
+    """Zwraca nazwę banku, którego sygnatura występuje w pierwszych bajtach pliku."""
+    for nazwa, parser in PARSERY_BANKOW.items():
+        if parser['sygnatura'] in naglowek:
+            return nazwa
+    return None
+
+
+def _nazwa_kolumny(kolumna):
+    """Nazwa kolumny z nagłówka CSV bez "#" (mBank) i spacji."""
+    return str(kolumna).replace("#", "").strip()
+
+
+def _zwiez(dane):
+    """Przetworzona paczka w zwartych typach - opis i kategoria jako napisy Arrow zamiast obiektów Pythona."""
+    for kolumna in ('kategoria', 'opis'):
+        dane[kolumna] = jako_tekst(dane[kolumna]).astype(TYP_OPISU)
+    return dane
+
+
+def _paczki_wyciagu(uploaded_file, parser):
+    """Generator: czyta wyciąg paczkami po ROZMIAR_PACZKI_CSV wierszy i oddaje przetworzone fragmenty.
+
+    Z pliku czytamy tylko kolumny z `parser['kolumny']`, a każdą paczkę
+    zwężamy do KOLUMNY_IMPORTU w zwartych typach, zanim przyjdzie następna -
+    zebrane paczki zajmują mniej niż jeden read_csv całego pliku.
+    Kończy na pierwszym wierszu bez daty - za nim banki wstawiają stopkę z podsumowaniem.
+    """
+    uploaded_file.seek(0)
+    czytnik = pd.read_csv(
+        uploaded_file, delimiter=';', encoding=parser['kodowanie'], index_col=False,
+        skiprows=parser['pomin_wierszy'], chunksize=ROZMIAR_PACZKI_CSV,
+        usecols=lambda kolumna: _nazwa_kolumny(kolumna) in parser['kolumny'],
+    )
+    for paczka in czytnik:
+        paczka.columns = paczka.columns.map(_nazwa_kolumny)
+        paczka = paczka.rename(columns=parser['kolumny'])
+
+        stopka = paczka['data'].isna().cummax()
+        if not stopka.all():
+            # Paczka z samą stopką (wyciąg o wielokrotności ROZMIAR_PACZKI_CSV wierszy) nie ma czego przetwarzać
+            yield _zwiez(parser['przetworz'](paczka[~stopka].copy()))
+        if stopka.any():
+            break
+
+
+@mierzone("import CSV")
+def przetworz_csv(uploaded_file):
+    """Parsuje wyciąg bankowy (format rozpoznawany po nagłówku) w jednym przebiegu po pliku."""
+    uploaded_file.seek(0)
+    bank = rozpoznaj_bank(uploaded_file.read(ROZMIAR_NAGLOWKA_CSV))
+    if bank is None:
+        return pd.DataFrame(columns=KOLUMNY_IMPORTU + ['bank'])
+
+    paczki = list(_paczki_wyciagu(uploaded_file, PARSERY_BANKOW[bank]))
+    if not paczki:
+        return pd.DataFrame(columns=KOLUMNY_IMPORTU + ['bank'])
+
+    dane = pd.concat(paczki, ignore_index=True)
+    dane['bank'] = bank
+    dane.attrs['bledne_kwoty'] = [opis for p in paczki for opis in p.attrs.get('bledne_kwoty', [])]
+    return dane
+
+
+IMPORT_MAX_PROCESOW = 4                # tyle wyciągów parsujemy naraz
+IMPORT_MIN_BAJTOW_PULI = 8 * 2 ** 20   # mniej danych parsujemy od razu - start procesów (spawn, ~1,3 s)
+                                       # trwa dłużej niż samo parsowanie (~10 MB/s)
+
+
+def _przetworz_plik(dane):
+    """przetworz_csv dla zawartości pliku w bajtach (wołane w procesie z puli)."""
+    return przetworz_csv(io.BytesIO(dane))
+
+
+@st.cache_resource
+def get_pula_importu():
+    """Pula procesów do parsowania wyciągów - wspólna dla sesji, uruchamiana raz na proces."""
+    # spawn, a nie fork: serwer ma wątki (lustro, kolejka zapisów) i fork skopiowałby ich zajęte blokady
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=min(IMPORT_MAX_PROCESOW, os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+@mierzone("import wielu CSV")
+def przetworz_wyciagi(pliki):
+    """Parsuje kilka wyciągów (lista par nazwa, bajty) równolegle i łączy je w jedną ramkę.
+
+    Wyciągi z kolejnych miesięcy nachodzą na siebie, więc transakcję z kilku
+    plików bierzemy raz - a powtórzoną w jednym pliku (np. dwie kawy tego
+    samego dnia) tyle razy, ile wystąpiła w tym pliku. Kolumna `plik` mówi,
+    skąd jest wiersz; attrs['pliki'] podsumowuje każdy plik, a
+    attrs['powtorzone'] to liczba pominiętych powtórzeń między plikami.
+    """
+    wyniki = None
+    if len(pliki) > 1 and sum(len(dane) for _, dane in pliki) >= IMPORT_MIN_BAJTOW_PULI:
+        pula = get_pula_importu()
+        try:
+            wyniki = list(pula.map(_przetworz_plik, [dane for _, dane in pliki]))
+        except BrokenProcessPool:
+            # Proces z puli padł (np. zabity przy braku pamięci) i zepsuta pula odrzuca już każde zadanie -
+            # zamykamy ją (następny import uruchomi nową), a te pliki parsujemy po kolei
+            pula.shutdown(wait=False, cancel_futures=True)
+            get_pula_importu.clear()
+    if wyniki is None:
+        wyniki = [_przetworz_plik(dane) for _, dane in pliki]
+
+    podsumowanie, czesci, bledne_kwoty = [], [], []
+    for (nazwa, _), df in zip(pliki, wyniki):
+        podsumowanie.append({
+            'plik': nazwa,
+            'bank': df['bank'].iloc[0] if not df.empty else None,
+            'transakcje': len(df),
+        })
+        bledne_kwoty += [f"{nazwa}: {opis}" for opis in df.attrs.get('bledne_kwoty', [])]
+        if not df.empty:
+            czesci.append(df.assign(plik=nazwa))
+
+    if czesci:
+        dane = pd.concat(czesci, ignore_index=True)
+        odciski = odciski_transakcji(dane)
+        # Para (odcisk, numer wystąpienia w pliku) powtarza się tylko między plikami
+        kolejne = odciski.groupby([odciski, dane['plik']]).cumcount()
+        powtorzone = pd.DataFrame({'odcisk': odciski, 'kolejne': kolejne}).duplicated().to_numpy()
+        dane = dane[~powtorzone].reset_index(drop=True)
+    else:
+        dane = pd.DataFrame(columns=KOLUMNY_IMPORTU + ['bank', 'plik'])
+        powtorzone = np.zeros(0, dtype=bool)
+
+    dane.attrs['pliki'] = podsumowanie
+    dane.attrs['powtorzone'] = int(powtorzone.sum())
+    dane.attrs['bledne_kwoty'] = bledne_kwoty
+    return dane
+
+
+REGULY_MAX_TOKENOW = 3       # najdłuższy przedrostek opisu (w słowach), z którego uczymy regułę
+REGULY_MIN_WYSTAPIEN = 2     # reguła musi mieć za sobą co najmniej tyle transakcji z historii...
+REGULY_MIN_PEWNOSC = 0.8     # ...i tyle z nich musi mieć tę samą kategorię
+
+
+def tokeny_opisu(seria):
+    """Opis -> lista słów: małe litery, bez cyfr i znaków (numery kart, daty) i bez przedrostka "ING "."""
+    opis = jako_tekst(seria).str.lower().str.replace("^ing ", "", regex=True)
+    return opis.str.replace("[^a-ząćęłńóśźż]+", " ", regex=True).str.split()
+
+
+class RegulyKategorii:
+    """Reguły kontrahent -> kategoria wyuczone z już skategoryzowanej historii.
+
+    Dla każdej długości przedrostka opisu (REGULY_MAX_TOKENOW słów, ..., 1 słowo)
+    trzymamy słownik przedrostek -> kategoria. Przedrostek trafia do słownika
+    tylko wtedy, gdy w historii zdecydowanie przeważa u niego jedna kategoria.
+    Przypisanie to kilka wywołań Series.map (od najdłuższego przedrostka) na
+    całym imporcie naraz.
+    """
+
+    def __init__(self, df):
+        kategorie = jako_tekst(df['kategoria'])
+        znane = (kategorie != "") & (kategorie != KATEGORIA_DOMYSLNA)
+        tokeny = tokeny_opisu(df.loc[znane, 'opis'])
+        kategorie = kategorie[znane]
+
+        self.slowniki = {}
+        for dlugosc in range(REGULY_MAX_TOKENOW, 0, -1):
+            pelne = tokeny.str.len() >= dlugosc
+            pary = pd.DataFrame({
+                'przedrostek': tokeny[pelne].str[:dlugosc].str.join(" "),
+                'kategoria': kategorie[pelne],
+            })
+            liczby = pary.value_counts().reset_index(name='liczba')
+            liczby['razem'] = liczby.groupby('przedrostek')['liczba'].transform('sum')
+            najczestsze = liczby.drop_duplicates('przedrostek')  # value_counts sortuje malejąco
+            pewne = najczestsze[
+                (najczestsze['liczba'] >= REGULY_MIN_WYSTAPIEN)
+                & (najczestsze['liczba'] >= REGULY_MIN_PEWNOSC * najczestsze['razem'])
+            ]
+            self.slowniki[dlugosc] = dict(zip(pewne['przedrostek'], pewne['kategoria']))
+
+    def __len__(self):
+        return sum(len(slownik) for slownik in self.slowniki.values())
+
+    @mierzone("reguły: przypisz")
+    def przypisz(self, df):
+        """Kategorie dla wierszy `df`: z reguł dla wierszy "Bez kategorii", pozostałe bez zmian."""
+        kategorie = jako_tekst(df['kategoria'])
+        do_ustalenia = (kategorie == "") | (kategorie == KATEGORIA_DOMYSLNA)
+        tokeny = tokeny_opisu(df.loc[do_ustalenia, 'opis'])
+
+        znalezione = pd.Series(np.nan, index=tokeny.index, dtype=object)
+        for dlugosc, slownik in self.slowniki.items():
+            if not slownik:
+                continue
+            brak = znalezione.isna() & (tokeny.str.len() >= dlugosc)
+            znalezione[brak] = tokeny[brak].str[:dlugosc].str.join(" ").map(slownik)
+
+        return kategorie.where(~do_ustalenia, znalezione.reindex(df.index).fillna(KATEGORIA_DOMYSLNA))
+
+
+@widok_wersji
+def wczytaj_reguly(wersja):
+    """Reguły kategorii z danych z pobierz_dane. `wersja` służy wyłącznie jako klucz cache."""
+    with mierz("reguły: nauka"):
+        return RegulyKategorii(wczytaj_dane(wersja))
@@ -0,0 +1,935 @@
+"""Dane w arkuszu: lokalne lustro (SQLite), cache odczytów i kolejka zapisów."""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from budzet.agregacje import KLUCZ_KOSTKI, IndeksDat, kostka_wydatkow
+from budzet.arkusz import do_ponowienia, get_polaczenie
+from budzet.pomiary import mierz, mierzone
+from budzet.schemat import (
+    KOLUMNY, jako_tekst, odciski_transakcji, typuj_kolumny, uzupelnij_bank, wyczysc_kwoty,
+)
+
+
+LUSTRO_SCIEZKA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".budzet_lustro.sqlite")
+LUSTRO_INTERWAL = 60     # [s] jak często wątek w tle sprawdza, czy arkusz się zmienił
+SCHEMAT_LUSTRA = 6       # podbić przy każdej zmianie tabel w lustrze
+MIGAWKI_MAX = 4          # tyle ostatnich wersji danych trzymamy w pamięci (jak max_entries widoków)
+
+# Funkcje cache liczone z danych jednej wersji (kostka, indeksy, reguły...) - czyści je uniewaznij_cache
+WIDOKI_WERSJI = []
+
+
+def widok_wersji(funkcja):
+    """Dekorator: st.cache_resource kluczowane wersją danych, usuwane po każdym zapisie.
+
+    Pierwszy argument udekorowanej funkcji to `wersja` z wersja_danych. Wynik
+    jest jeden na proces (wspólny dla sesji, bez kopiowania przy każdym
+    odczycie), więc wolno go tylko czytać.
+    """
+    widok = st.cache_resource(max_entries=4, show_spinner=False)(funkcja)
+    WIDOKI_WERSJI.append(widok)
+    return widok
+
+
+def _pobierz_z_arkusza(worksheet):
+    """Pobiera cały arkusz przez API i parsuje go do DataFrame."""
+    with mierz("get_all_records", 'api'):
+        data = worksheet.get_all_records()
+    with mierz("parsowanie arkusza"):
+        return _parsuj_arkusz(data)
+
+
+def _parsuj_arkusz(data):
+    """Wynik get_all_records -> DataFrame z typami, bankiem i listą nieczytelnych kwot w attrs."""
+    df = pd.DataFrame(data)
+
+    if df.empty:
+        return pd.DataFrame(columns=KOLUMNY)
+
+    df.columns = df.columns.str.lower().str.strip()
+    df.attrs['naglowek'] = list(df.columns)
+    df['data'] = pd.to_datetime(df['data'], errors='coerce')
+
+    df['kwota'], bledne = wyczysc_kwoty(df['kwota'])
+
+    df['id'] = pd.to_numeric(df['id'], errors='coerce').fillna(0).astype(int)
+    df.attrs['bledne_kwoty'] = df.loc[bledne, 'id'].tolist()
+
+    # Migracja: arkusz sprzed kolumny `bank` (albo puste komórki) - uzupełniamy w pamięci,
+    # do arkusza trafi przy najbliższym pełnym zapisie
+    df['bank'] = uzupelnij_bank(df)
+
+    return df
+
+
+class LustroDanych:
+    """Lokalna kopia arkusza w SQLite - podstawowe źródło odczytu.
+
+    Wiersze są kluczowane pozycją w arkuszu (`wiersz`), bo tak adresuje je
+    zapis delta. Kwoty wierszy są takie jak w arkuszu (pełny zapis odsyła je
+    bez zmian), a sumy w kostce trzymamy w groszach jako INTEGER, więc
+    dokładanie i odejmowanie zmian w kostce nie zbiera błędów zaokrągleń.
+    Każdy wiersz ma sumę kontrolną, więc synchronizacja zapisuje
+    lokalnie tylko to, co faktycznie się zmieniło. `wersja` rośnie przy każdej
+    zmianie i jest kluczem cache dla pobierz_dane.
+    """
+
+    def __init__(self, sciezka):
+        self.sciezka = sciezka
+        self._lock = threading.Lock()
+        # Trzymana od odczytu arkusza do wprowadzenia go do lustra (pobieranie w tle i zapis) -
+        # wolne pobieranie nie nadpisze więc lustra starszym stanem niż zapis, który skończył się wcześniej
+        self.blokada_arkusza = threading.RLock()
+        self.zatrzymaj = threading.Event()   # kończy wątek synchronizacji (zamknij_zasoby)
+        self.ostatnia_synchronizacja = None
+        self.ostatni_blad = None
+        self.bledne_kwoty = []
+        with self._polacz() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (klucz TEXT PRIMARY KEY, wartosc TEXT)")
+            meta = dict(conn.execute("SELECT klucz, wartosc FROM meta").fetchall())
+            if int(meta.get('schemat', 1)) != SCHEMAT_LUSTRA:
+                # Zmienił się układ tabeli - wyrzucamy kopię, przy starcie pobierze się od nowa
+                conn.execute("DROP TABLE IF EXISTS transakcje")
+                conn.execute("DROP TABLE IF EXISTS kostka")
+                conn.execute("DELETE FROM meta WHERE klucz != 'wersja'")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('schemat', ?)", (str(SCHEMAT_LUSTRA),))
+                meta = {'wersja': meta.get('wersja', 0)}
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS transakcje ("
+                "wiersz INTEGER PRIMARY KEY, id INTEGER, data TEXT, kategoria TEXT, "
+                "opis TEXT, kwota REAL, bank TEXT, suma INTEGER, odcisk INTEGER)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS transakcje_odcisk ON transakcje (odcisk)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kostka (miesiac TEXT, kategoria TEXT, bank TEXT, "
+                "suma INTEGER, liczba INTEGER, PRIMARY KEY (miesiac, kategoria, bank))"
+            )
+        self.rewizja = meta.get('rewizja')
+        self.wersja = int(meta.get('wersja', 0))
+        self.naglowek = json.loads(meta['naglowek']) if 'naglowek' in meta else list(KOLUMNY)
+
+    def _polacz(self):
+        return sqlite3.connect(self.sciezka, timeout=30)
+
+    @mierzone("lustro: wczytaj", 'lustro')
+    def wczytaj(self):
+        """Zwraca dane w kolejności wierszy arkusza (kategoria i bank jako Categorical).
+
+        attrs['wersja_lustra'] to wersja, z której są - czytamy pod tą samą blokadą co synchronizuj.
+        """
+        with self._lock, self._polacz() as conn:
+            df = pd.read_sql_query(
+                "SELECT id, data, kategoria, opis, kwota, bank FROM transakcje ORDER BY wiersz", conn
+            )
+            wersja = self.wersja
+        df = z_eksportu(df)
+        df.attrs['wersja_lustra'] = wersja
+        return df
+
+    def wczytaj_kostke(self, wersja):
+        """Zwraca agregaty miesiąc × kategoria × bank (suma, liczba) albo None, gdy lustro nie jest już w wersji `wersja`."""
+        with self._lock, self._polacz() as conn:
+            if self.wersja != wersja:
+                return None
+            return pd.read_sql_query(
+                "SELECT miesiac, kategoria, bank, suma / 100.0 AS suma, liczba FROM kostka", conn
+            )
+
+    @staticmethod
+    def _aktualizuj_kostke(conn, dodane, usuniete):
+        """Dolicza do kostki nowe wiersze i odejmuje zastąpione - koszt zależy tylko od liczby zmian."""
+        ujemne = kostka_wydatkow(usuniete, w_groszach=True)
+        ujemne[['suma', 'liczba']] = -ujemne[['suma', 'liczba']]
+        delta = pd.concat([kostka_wydatkow(dodane, w_groszach=True), ujemne], ignore_index=True)
+        delta = delta.groupby(KLUCZ_KOSTKI, as_index=False)[['suma', 'liczba']].sum()
+        conn.executemany(
+            "INSERT INTO kostka (miesiac, kategoria, bank, suma, liczba) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (miesiac, kategoria, bank) DO UPDATE SET "
+            "suma = suma + excluded.suma, liczba = liczba + excluded.liczba",
+            delta.astype(object).itertuples(index=False, name=None),
+        )
+        conn.execute("DELETE FROM kostka WHERE liczba <= 0")
+
+    def liczniki_odciskow(self, wersja):
+        """Ile razy każdy odcisk transakcji występuje w bazie (indeks odcisk -> liczba) albo None, jak wczytaj_kostke."""
+        with self._lock, self._polacz() as conn:
+            if self.wersja != wersja:
+                return None
+            df = pd.read_sql_query("SELECT odcisk, COUNT(*) AS liczba FROM transakcje GROUP BY odcisk", conn)
+        return df.set_index('odcisk')['liczba']
+
+    @mierzone("lustro: synchronizuj", 'lustro')
+    def synchronizuj(self, df, rewizja, naglowek):
+        """Wprowadza do lustra stan `df` (w kolejności arkusza). Zwraca True, jeśli coś się zmieniło.
+
+        `naglowek` to faktyczny układ kolumn w arkuszu - zapis delta jest
+        możliwy tylko, gdy zawiera komplet KOLUMNY.
+        """
+        nowe = _do_eksportu(df)
+        nowe.insert(0, 'wiersz', np.arange(1, len(nowe) + 1))
+        nowe['suma'] = pd.util.hash_pandas_object(nowe[KOLUMNY], index=False).values.view(np.int64)
+        nowe['odcisk'] = odciski_transakcji(nowe).values
+
+        with self._lock:
+            with self._polacz() as conn:
+                stare = pd.read_sql_query(
+                    "SELECT wiersz, suma, data, kategoria, opis, kwota, bank FROM transakcje", conn
+                ).set_index('wiersz')
+                zmienione = nowe[nowe['suma'].ne(stare['suma'].reindex(nowe['wiersz']).values)]
+                nadmiar = len(stare) - len(nowe)
+                zastapione = stare[stare.index.isin(zmienione['wiersz']) | (stare.index > len(nowe))]
+
+                if not zmienione.empty:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO transakcje "
+                        "(wiersz, id, data, kategoria, opis, kwota, bank, suma, odcisk) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        zmienione.astype(object).itertuples(index=False, name=None),
+                    )
+                if nadmiar > 0:
+                    conn.execute("DELETE FROM transakcje WHERE wiersz > ?", (len(nowe),))
+                if not zmienione.empty or not zastapione.empty:
+                    self._aktualizuj_kostke(conn, zmienione, zastapione)
+
+                zmiana = not zmienione.empty or nadmiar > 0 or naglowek != self.naglowek
+                wersja = self.wersja + 1 if zmiana else self.wersja
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (klucz, wartosc) VALUES (?, ?)",
+                    [('rewizja', rewizja), ('wersja', str(wersja)), ('naglowek', json.dumps(naglowek))],
+                )
+            # Nowa wersja dopiero po commicie - kto ją zobaczy, przeczyta już nowe wiersze
+            self.wersja = wersja
+            self.rewizja = rewizja
+            self.naglowek = naglowek
+        self.ostatnia_synchronizacja = datetime.datetime.now()
+        self.ostatni_blad = None
+        return zmiana
+
+
+@mierzone("synchronizuj_lustro", 'api')
+def synchronizuj_lustro(lustro, polaczenie, wymus=False):
+    """Ściąga arkusz do lustra, ale tylko gdy zmieniła się jego rewizja (modifiedTime z Drive) albo `wymus`."""
+    with lustro.blokada_arkusza:
+        rewizja = polaczenie.arkusz().get_lastUpdateTime()
+        if rewizja == lustro.rewizja and not wymus:
+            lustro.ostatnia_synchronizacja = datetime.datetime.now()
+            return False
+        df = _pobierz_z_arkusza(polaczenie.zakladka())
+        lustro.bledne_kwoty = df.attrs.get('bledne_kwoty', [])
+        return lustro.synchronizuj(df, rewizja, df.attrs.get('naglowek', KOLUMNY))
+
+
+def _petla_synchronizacji(lustro):
+    # Najpierw czekamy - pierwszą synchronizację robi pobierz_dane przy starcie
+    while not lustro.zatrzymaj.wait(LUSTRO_INTERWAL):
+        try:
+            polaczenie = get_polaczenie()
+            polaczenie.odswiez_token()
+            synchronizuj_lustro(lustro, polaczenie)
+        except Exception as e:
+            if not do_ponowienia(e):
+                get_polaczenie().uniewaznij()
+            lustro.ostatni_blad = str(e)
+
+
+# Lustro, kolejka i ich wątki nie siedzą w st.cache_resource: "Clear cache" z menu Streamlit
+# czyści cache_resource, a drugi komplet wątków zapisywałby do arkusza i pliku SQLite równolegle
+# z pierwszym (każdy ze swoją blokadą). Zwalnia je tylko zamknij_zasoby.
+_zasoby = {'lock': threading.RLock(), 'lustro': None, 'kolejka': None}
+
+
+def get_lustro():
+    """Jedno lustro na proces + wątek, który w tle dogania zmiany w arkuszu."""
+    with _zasoby['lock']:
+        if _zasoby['lustro'] is None:
+            lustro = LustroDanych(LUSTRO_SCIEZKA)
+            threading.Thread(
+                target=_petla_synchronizacji, args=(lustro,), name="synchronizacja-lustra", daemon=True,
+            ).start()
+            _zasoby['lustro'] = lustro
+        return _zasoby['lustro']
+
+
+@st.cache_resource
+def migawka_danych():
+    """Wspólne dla wszystkich sesji migawki danych: wersja -> niezmienna ramka (kilka ostatnich wersji)."""
+    return {'lock': threading.Lock(), 'wersje': {}}
+
+
+def wczytaj_dane(wersja):
+    """Dane z lokalnego lustra razem ze zmianami czekającymi w kolejce zapisu - jedna kopia na proces.
+
+    Migawkę budujemy raz na wersję (pod blokadą, więc kilka sesji naraz nie
+    czyta lustra kilka razy). Kilka ostatnich zostaje w pamięci, żeby widoki
+    (indeks dat, kostka...) liczone dla wersji z attrs['wersja'] ramki
+    powstały z tych samych danych co ona. Starszej wersji niż zapamiętane nie
+    odtworzymy - dostaje najnowszą. Każda sesja dostaje płytką kopię: przy
+    Copy-on-Write (pandas 3) zapis do niej kopiuje tylko zmienianą kolumnę,
+    a wspólna migawka zostaje nietknięta.
+    """
+    migawki = migawka_danych()
+    with migawki['lock']:
+        wersje = migawki['wersje']
+        if wersja not in wersje:
+            if wersje and wersja < max(wersje):
+                wersja = max(wersje)
+            else:
+                wersja = max(wersja, wersja_danych())   # etykieta nie starsza niż czytany stan
+                df = get_lustro().wczytaj()
+                with mierz("nałożenie kolejki zapisów"):
+                    migawka = get_kolejka_zapisu().naloz(df)
+                # Bez zmian z kolejki kostkę i odciski tej migawki można brać wprost z lustra (wczytaj_kostke)
+                migawka.attrs['czyste_lustro'] = df.attrs['wersja_lustra'] if migawka is df else None
+                wersje[wersja] = migawka
+                for stara in sorted(wersje)[:-MIGAWKI_MAX]:
+                    del wersje[stara]
+        df = wersje[wersja].copy(deep=False)
+    df.attrs['wersja'] = wersja
+    return df
+
+
+def wersja_danych():
+    """Klucz cache danych: wersja lustra i wersja kolejki zapisów."""
+    return get_lustro().wersja, get_kolejka_zapisu().wersja
+
+
+def pobierz_dane():
+    """Dane dla strony; ich wersja jest w df.attrs['wersja'] (zob. dane_strony)."""
+    try:
+        lustro = get_lustro()
+        if lustro.rewizja is None:
+            # Pierwsze uruchomienie - lustro jest puste, więc raz czekamy na arkusz
+            synchronizuj_lustro(lustro, get_polaczenie())
+        return wczytaj_dane(wersja_danych())
+    except Exception as e:
+        get_polaczenie().uniewaznij()
+        st.error(f"⚠️ Błąd pobierania danych: {e}")
+        df = pd.DataFrame(columns=KOLUMNY)
+        df.attrs['wersja'] = (-1, -1)   # starsza od każdej - widoki dostaną najnowsze dane
+        return df
+
+
+def dane_strony():
+    """Dane strony i ich wersja - jedna na cały przebieg skryptu.
+
+    Widoki (wczytaj_indeks_dat, wczytaj_kostke...) trzeba wołać z tą wersją,
+    a nie z nowym wersja_danych(): w międzyczasie mógł skończyć się zapis,
+    a indeksy i agregaty mają pochodzić z tej samej migawki co dane.
+    """
+    df = pobierz_dane()
+    return df, df.attrs['wersja']
+
+
+def uniewaznij_cache(wersja):
+    """Usuwa z cache tylko widoki danej wersji danych (wołane po każdym zapisie).
+
+    Migawek nie trzeba czyścić - nadmiarowe usuwa wczytaj_dane.
+    Nie czyścimy globalnego cache - inne funkcje cache zostają nietknięte.
+    """
+    for widok in WIDOKI_WERSJI:
+        widok.clear(wersja)
+
+
+@widok_wersji
+def wczytaj_kostke(wersja):
+    """Kostka agregatów migawki `wersja` - z lustra, jeśli jest dokładnie w tym stanie, inaczej z danych."""
+    df = wczytaj_dane(wersja)
+    kostka = get_lustro().wczytaj_kostke(df.attrs.get('czyste_lustro'))
+    if kostka is None:
+        # Migawka ma zmiany z kolejki albo lustro poszło już dalej - liczymy kostkę z jej danych
+        return kostka_wydatkow(df)
+    return kostka
+
+
+@widok_wersji
+def wczytaj_odciski(wersja):
+    """Liczniki odcisków migawki `wersja` (jak wczytaj_kostke)."""
+    df = wczytaj_dane(wersja)
+    odciski = get_lustro().liczniki_odciskow(df.attrs.get('czyste_lustro'))
+    if odciski is None:
+        return odciski_transakcji(df).value_counts()
+    return odciski
+
+
+@widok_wersji
+def wczytaj_indeks_dat(wersja):
+    """Indeks dat dla danych z pobierz_dane. `wersja` służy wyłącznie jako klucz cache."""
+    with mierz("indeks dat"):
+        return IndeksDat(wczytaj_dane(wersja)['data'])
+
+
+def _do_eksportu(df):
+    """Sprowadza ramkę do postaci zapisywanej w arkuszu (kolumny KOLUMNY, daty jako tekst)."""
+    df_export = pd.DataFrame({
+        'id': pd.to_numeric(df['id'], errors='coerce').fillna(0).astype(int),
+        'data': pd.to_datetime(df['data'], errors='coerce').dt.strftime('%Y-%m-%d').fillna(""),
+        'kategoria': jako_tekst(df['kategoria']),
+        'opis': jako_tekst(df['opis']),
+        'kwota': pd.to_numeric(df['kwota'], errors='coerce').fillna(0.0).astype(float),
+        'bank': uzupelnij_bank(df),
+    })
+    return df_export.reset_index(drop=True)
+
+
+def z_eksportu(df):
+    """Odwrotność _do_eksportu: typy takie jak w pobierz_dane (zob. typuj_kolumny)."""
+    df = df[KOLUMNY].reset_index(drop=True)
+    df['data'] = pd.to_datetime(df['data'], errors='coerce')
+    df['kwota'] = df['kwota'].astype(float)
+    return typuj_kolumny(df)
+
+
+def _komorka(wartosc):
+    """Zamienia wartość na CellData dla spreadsheets.batchUpdate."""
+    if isinstance(wartosc, (int, float, np.integer, np.floating)):
+        return {"userEnteredValue": {"numberValue": float(wartosc)}}
+    return {"userEnteredValue": {"stringValue": str(wartosc)}}
+
+
+def _zakresy_ciagle(pozycje):
+    """Grupuje posortowane pozycje w ciągłe przedziały [start, koniec)."""
+    zakresy = []
+    for p in pozycje:
+        if zakresy and zakresy[-1][1] == p:
+            zakresy[-1][1] = p + 1
+        else:
+            zakresy.append([p, p + 1])
+    return zakresy
+
+
+def zbuduj_zadania_delta(df_baza, df_nowe, sheet_id, kolumny_arkusza):
+    """Porównuje stan serwera z nowym stanem po `id` i zwraca listę żądań batchUpdate.
+
+    `kolumny_arkusza` to układ kolumn w arkuszu. Zwraca None, jeśli różnicy nie
+    da się bezpiecznie policzyć (np. zdublowane ID albo arkusz bez którejś
+    z KOLUMNY) - wtedy trzeba nadpisać cały arkusz.
+    """
+    if set(kolumny_arkusza) != set(KOLUMNY):
+        return None
+
+    # Pozycja w arkuszu = kolejność wierszy z get_all_records (wiersz 0 to nagłówek)
+    kolumny_arkusza = list(kolumny_arkusza)
+    stare = _do_eksportu(df_baza)
+    stare['wiersz'] = np.arange(1, len(stare) + 1)
+    nowe = _do_eksportu(df_nowe)
+
+    if not stare['id'].is_unique or not nowe['id'].is_unique or (nowe['id'] == 0).any():
+        return None
+
+    stare = stare.set_index('id')
+    nowe = nowe.set_index('id')
+    zadania = []
+
+    # 1. Zmienione komórki (pozycje liczone jeszcze przed usuwaniem)
+    wspolne = nowe.index.intersection(stare.index)
+    pola = [k for k in kolumny_arkusza if k != 'id']
+    rozne = nowe.loc[wspolne, pola].ne(stare.loc[wspolne, pola]).stack()
+    for id_wiersza, kolumna in rozne[rozne].index:
+        zadania.append({"updateCells": {
+            "rows": [{"values": [_komorka(nowe.at[id_wiersza, kolumna])]}],
+            "fields": "userEnteredValue",
+            "start": {
+                "sheetId": sheet_id,
+                "rowIndex": int(stare.at[id_wiersza, 'wiersz']),
+                "columnIndex": kolumny_arkusza.index(kolumna),
+            },
+        }})
+
+    # 2. Usunięte wiersze - od dołu, żeby indeksy się nie przesuwały
+    usuniete = sorted(stare.loc[stare.index.difference(nowe.index), 'wiersz'].tolist())
+    for poczatek, koniec in reversed(_zakresy_ciagle(usuniete)):
+        zadania.append({"deleteDimension": {"range": {
+            "sheetId": sheet_id, "dimension": "ROWS",
+            "startIndex": poczatek, "endIndex": koniec,
+        }}})
+
+    # 3. Nowe wiersze - jeden appendCells na końcu
+    dodane = nowe.loc[nowe.index.difference(stare.index)].reset_index()
+    if not dodane.empty:
+        zadania.append({"appendCells": {
+            "sheetId": sheet_id,
+            "rows": [
+                {"values": [_komorka(w) for w in wiersz]}
+                for wiersz in dodane[kolumny_arkusza].itertuples(index=False)
+            ],
+            "fields": "userEnteredValue",
+        }})
+
+    return zadania
+
+
+def stan_po_delcie(df_baza, df_nowe):
+    """Odtwarza lokalnie kolejność wierszy arkusza po wykonaniu zadań z zbuduj_zadania_delta."""
+    nowe = df_nowe.set_index('id')
+    zostaja = df_baza.loc[df_baza['id'].isin(nowe.index), 'id']
+    dodane = nowe.index.difference(df_baza['id'])
+    kolejnosc = list(zostaja) + list(dodane)
+    return nowe.loc[kolejnosc].reset_index()[list(df_baza.columns)]
+
+
+def scal_trojstronnie(df_baza, df_moje, df_serwer, podglad=False):
+    """Łączy nasze zmiany (baza -> moje) ze zmianami, które ktoś inny zapisał w międzyczasie (baza -> serwer).
+
+    Porównujemy po `id` i pojedynczych komórkach: zmiany w różnych wierszach
+    lub kolumnach łączą się bez strat. Prawdziwy konflikt (ta sama komórka
+    zmieniona na różne wartości, edycja wiersza usuniętego przez kogoś innego
+    albo usunięcie wiersza, który ktoś inny zmienił) rozstrzygamy na korzyść
+    serwera i zwracamy w liście konfliktów. Zwraca (stan do zapisu, konflikty)
+    albo (df_moje, []), gdy ID nie są jednoznaczne.
+
+    Nowy wiersz, który z tym samym ID i odciskiem już jest na serwerze, uznajemy
+    za zapisany (ponowienie zapisu, który doszedł mimo błędu 5xx). `podglad=True`
+    (widok zmian czekających w kolejce): za zapisany uznajemy każdy nowy wiersz,
+    którego ID jest już na serwerze, zamiast nadawać mu nowe ID.
+    """
+    baza, moje, serwer = (_do_eksportu(df) for df in (df_baza, df_moje, df_serwer))
+    if not all(df['id'].is_unique and (df['id'] != 0).all() for df in (baza, moje, serwer)):
+        return df_moje, []
+    baza, moje, serwer = (df.set_index('id') for df in (baza, moje, serwer))
+    pola = [k for k in KOLUMNY if k != 'id']
+    konflikty = []
+
+    # 1. Edycje: komórki zmienione u nas, naniesione na stan serwera
+    edytowane = moje.index.intersection(baza.index)
+    moje_zmiany = moje.loc[edytowane, pola].ne(baza.loc[edytowane, pola])
+    edytowane = moje_zmiany.index[moje_zmiany.any(axis=1)]
+
+    wspolne = edytowane.intersection(serwer.index)
+    m = moje_zmiany.loc[wspolne]
+    ich_zmiany = serwer.loc[wspolne, pola].ne(baza.loc[wspolne, pola])
+    sprzeczne = m & ich_zmiany & moje.loc[wspolne, pola].ne(serwer.loc[wspolne, pola])
+    wynik = serwer.copy()
+    wynik.loc[wspolne, pola] = serwer.loc[wspolne, pola].mask(m & ~sprzeczne, moje.loc[wspolne, pola])
+    sprzeczne = sprzeczne.stack()
+    for id_wiersza, kolumna in sprzeczne[sprzeczne].index:
+        konflikty.append(
+            f"ID {id_wiersza}, {kolumna}: ktoś zmienił na „{serwer.at[id_wiersza, kolumna]}” - "
+            f"Twoja wartość „{moje.at[id_wiersza, kolumna]}” nie została zapisana"
+        )
+    for id_wiersza in edytowane.difference(serwer.index):
+        konflikty.append(f"ID {id_wiersza}: wiersz został usunięty przez kogoś innego - Twoje zmiany przepadły")
+
+    # 2. Usunięcia: tylko wierszy, których nikt w międzyczasie nie zmienił
+    usuniete = baza.index.difference(moje.index).intersection(serwer.index)
+    zmienione_u_nich = serwer.loc[usuniete, pola].ne(baza.loc[usuniete, pola]).any(axis=1)
+    for id_wiersza in usuniete[zmienione_u_nich.to_numpy()]:
+        konflikty.append(f"ID {id_wiersza}: ktoś zmienił ten wiersz - nie został usunięty")
+    wynik = wynik.drop(usuniete[~zmienione_u_nich.to_numpy()])
+
+    # 3. Nowe wiersze: już zapisane pomijamy, a jeśli ktoś zajął to samo ID innym wierszem, dostają nowe
+    dodane = moje.loc[moje.index.difference(baza.index)].reset_index()
+    zajete = dodane['id'].isin(serwer.index)
+    zapisane = zajete & _te_same_transakcje(dodane, serwer.reset_index())
+    dodane, zajete = dodane[~zapisane], zajete[~zapisane]
+    if podglad:
+        dodane = dodane[~zajete]
+    elif zajete.any():
+        dodane.loc[zajete, 'id'] = przydziel_id(int(zajete.sum()), max(serwer.index.max(), dodane['id'].max()))
+    wynik = pd.concat([wynik.reset_index(), dodane], ignore_index=True)
+    return wynik[KOLUMNY], konflikty
+
+
+def _te_same_transakcje(df, serwer):
+    """Maska wierszy `df`, które pod tym samym ID już są w `serwer` z tym samym odciskiem transakcji."""
+    serwer = serwer.reset_index(drop=True)
+    pary = pd.MultiIndex.from_arrays([serwer['id'], odciski_transakcji(serwer).to_numpy()])
+    return pd.MultiIndex.from_arrays([df['id'], odciski_transakcji(df).to_numpy()]).isin(pary)
+
+
+@mierzone("zapis do arkusza", 'api')
+def _zapisz_w_arkuszu(polaczenie, lustro, df_to_save, pelny=False, df_bazowy=None, utrwal=None):
+    """Wysyła stan tabeli do arkusza (wołane przez wątek zapisu).
+
+    Domyślnie wysyła tylko różnice względem aktualnego stanu arkusza (jedno
+    spreadsheets.batchUpdate). `pelny=True` nadpisuje cały arkusz - np. przy
+    przeindeksowaniu, gdzie zmieniają się wszystkie ID.
+
+    `df_bazowy` to dane, na których użytkownik robił zmiany. Jeśli arkusz
+    od tego czasu się zmienił, nasze zmiany są nanoszone na jego aktualny
+    stan (scal_trojstronnie). Zwraca (stan arkusza po zapisie, rewizja,
+    nagłówek, konflikty) - do wprowadzenia w lustrze.
+
+    `utrwal(dane, baza)` dostaje scalony stan przed wysłaniem, żeby ponowienie
+    po błędzie zaczynało od niego (te same nowe ID), a nie od pierwotnej edycji.
+    """
+    sh = polaczenie.arkusz()
+    worksheet = polaczenie.zakladka()
+
+    # Rewizja arkusza to nasz token: jeśli ktoś zapisał od naszego odczytu, dociągamy jego zmiany
+    if sh.get_lastUpdateTime() != lustro.rewizja:
+        synchronizuj_lustro(lustro, polaczenie)
+    df_baza = lustro.wczytaj()
+
+    konflikty = []
+    if df_bazowy is not None and not pelny:
+        df_to_save, konflikty = scal_trojstronnie(df_bazowy, df_to_save, df_baza)
+        if utrwal is not None:
+            utrwal(_do_eksportu(df_to_save), _do_eksportu(df_baza))
+
+    zadania = None
+    if not pelny and not df_baza.empty:
+        zadania = zbuduj_zadania_delta(df_baza, df_to_save, worksheet.id, lustro.naglowek)
+
+    if zadania is None:
+        df_export = _do_eksportu(df_to_save)
+        headers = df_export.columns.tolist()
+        values = df_export.values.tolist()
+
+        # Najpierw nadpisujemy, potem czyścimy nadmiarowy ogon - arkusz nigdy nie jest pusty
+        with mierz("worksheet.update", 'api'):
+            worksheet.update([headers] + values)
+        if len(df_baza) > len(values):
+            worksheet.batch_clear([f"A{len(values) + 2}:Z"])
+        return df_export, sh.get_lastUpdateTime(), headers, konflikty
+
+    if zadania:
+        with mierz("batch_update", 'api'):
+            sh.batch_update({"requests": zadania})
+    df_stan = stan_po_delcie(_do_eksportu(df_baza), _do_eksportu(df_to_save))
+    return df_stan, sh.get_lastUpdateTime(), lustro.naglowek, konflikty
+
+
+@mierzone("dopisanie do arkusza", 'api')
+def _dopisz_w_arkuszu(polaczenie, lustro, df_export, utrwal=None):
+    """Dopisuje nowe transakcje na koniec arkusza jednym append_rows (wołane przez wątek zapisu).
+
+    Wiersze, które z tym samym ID i odciskiem już są w arkuszu (ponowienie po
+    błędzie 5xx, choć zapis doszedł), nie są wysyłane drugi raz. Jeśli ktoś
+    w międzyczasie zajął któreś z ID innym wierszem, wiersze dostają nowe -
+    a `utrwal(dane)` zapamiętuje je przed wysłaniem, żeby ponowienie ich nie zmieniało.
+    Zwraca (stan arkusza po zapisie, rewizja, nagłówek).
+    """
+    sh = polaczenie.arkusz()
+    worksheet = polaczenie.zakladka()
+
+    if sh.get_lastUpdateTime() != lustro.rewizja:
+        synchronizuj_lustro(lustro, polaczenie)
+    df_baza = _do_eksportu(lustro.wczytaj())
+
+    zapisane = _te_same_transakcje(df_export, df_baza)
+    zajete = df_export['id'].isin(df_baza['id']) & ~zapisane
+    if zajete.any():
+        df_export = df_export.copy()
+        df_export.loc[zajete, 'id'] = przydziel_id(int(zajete.sum()), max(df_baza['id'].max(), df_export['id'].max()))
+        if utrwal is not None:
+            utrwal(df_export)
+    df_export = df_export[~zapisane]
+    df_stan = pd.concat([df_baza, df_export], ignore_index=True)
+
+    if set(lustro.naglowek) != set(KOLUMNY):
+        # Arkusz w starym układzie (np. bez kolumny bank) - jednorazowo przepisujemy całość
+        df_stan, rewizja, naglowek, _ = _zapisz_w_arkuszu(polaczenie, lustro, df_stan, pelny=True)
+        return df_stan, rewizja, naglowek
+
+    if not df_export.empty:
+        with mierz("append_rows", 'api'):
+            worksheet.append_rows(df_export[lustro.naglowek].values.tolist())
+    return df_stan, sh.get_lastUpdateTime(), lustro.naglowek
+
+
+def _zgodny_z_arkuszem(polaczenie, df_stan, naglowek):
+    """Czy kolumna ID w arkuszu to dokładnie ID z `df_stan`, w tej samej kolejności (jedno zapytanie).
+
+    Zapis delta adresuje wiersze pozycją, a rewizję czytamy przed zapisem i po
+    nim osobno - sortowania czy wstawienia wiersza przez kogoś w tym czasie
+    żaden token nie pokaże, kolejność ID tak.
+    """
+    with mierz("col_values", 'api'):
+        ids = polaczenie.zakladka().col_values(naglowek.index('id') + 1, value_render_option='UNFORMATTED_VALUE')
+    ids = pd.to_numeric(pd.Series(ids[1:], dtype=object), errors='coerce').fillna(0).astype(int)
+    return ids.tolist() == _do_eksportu(df_stan)['id'].tolist()
+
+
+ZAPIS_MAX_PROB = 6          # tyle razy ponawiamy zapis odrzucony przez limit zapytań Google
+ZAPIS_MAX_PRZERWA = 60      # [s] najdłuższa przerwa między próbami
+
+
+class KolejkaZapisu:
+    """Zapisy czekające na wysłanie do arkusza przez wątek w tle.
+
+    Przycisk "Zapisz" tylko dodaje zadanie - interfejs od razu pokazuje dane
+    ze zmianami naniesionymi na lustro (naloz), a arkusz dogania je w tle.
+    Kolejne edycje tabeli czekające w kolejce są łączone w jedno zadanie.
+    Zadanie pamięta sesje, których zmiany zawiera - konflikty i nieudane
+    zapisy widzi (i rozstrzyga) tylko właściwa sesja. `wersja` rośnie przy każdej zmianie kolejki i razem z wersją lustra jest
+    kluczem cache danych.
+    """
+
+    def __init__(self):
+        self._warunek = threading.Condition()
+        self.zadania = []      # {'rodzaj': 'zapis' | 'pelny' | 'dopisz', 'dane', 'baza', 'sesje', 'w_toku'}
+        self.nieudane = []     # (zadanie, opis błędu)
+        self.konflikty = {}    # sesja -> lista opisów
+        self.ponowienie = None
+        self.wersja = 0
+        self.zamknieta = False
+
+    def dodaj(self, rodzaj, dane, baza=None, sesja=None):
+        with self._warunek:
+            ostatnie = self.zadania[-1] if self.zadania else None
+            scalone = None
+            if ostatnie and not ostatnie['w_toku'] and ostatnie['rodzaj'] == rodzaj == 'zapis' and baza is not None:
+                # Kolejka jest wspólna dla sesji - nowa edycja mogła powstać na starszych danych niż
+                # czekająca, więc nanosimy na nią tylko zmiany baza -> dane (jak przy zapisie do arkusza)
+                scalone, konflikty = scal_trojstronnie(baza, dane, ostatnie['dane'])
+            if scalone is not None and scalone is not dane:
+                # Baza zostaje z pierwszej edycji - względem niej zapis policzy zmiany obu
+                ostatnie['dane'] = scalone
+                ostatnie['sesje'].add(sesja)
+                self.konflikty.setdefault(sesja, []).extend(konflikty)
+            elif ostatnie and not ostatnie['w_toku'] and ostatnie['rodzaj'] == rodzaj == 'dopisz':
+                ostatnie['dane'] = pd.concat([ostatnie['dane'], dane], ignore_index=True)
+                ostatnie['sesje'].add(sesja)
+            else:
+                self.zadania.append({'rodzaj': rodzaj, 'dane': dane, 'baza': baza, 'sesje': {sesja}, 'w_toku': False})
+            self.wersja += 1
+            self._warunek.notify()
+
+    def pobierz(self):
+        """Czeka na pierwsze zadanie z kolejki i oznacza je jako wysyłane (None - kolejka zamknięta)."""
+        with self._warunek:
+            while not self.zadania and not self.zamknieta:
+                self._warunek.wait()
+            if self.zamknieta:
+                return None
+            zadanie = self.zadania[0]
+            zadanie['w_toku'] = True
+            return zadanie
+
+    def zakoncz(self, zadanie, konflikty=()):
+        with self._warunek:
+            self.zadania.remove(zadanie)
+            if konflikty:
+                for sesja in zadanie['sesje']:
+                    self.konflikty.setdefault(sesja, []).extend(konflikty)
+            self.ponowienie = None
+            self.wersja += 1
+
+    def utrwal(self, zadanie, dane, baza=None):
+        """Zapamiętuje w zadaniu stan, który właśnie idzie do arkusza (z nadanymi ID) - od niego zacznie ponowienie."""
+        with self._warunek:
+            zadanie['dane'] = dane
+            if baza is not None:
+                zadanie['baza'] = baza
+
+    def wstrzymaj(self, zadanie, przerwa):
+        """Zadanie czeka `przerwa` sekund na kolejną próbę - do tego czasu można do niego dołączać edycje."""
+        with self._warunek:
+            zadanie['w_toku'] = False
+            self.ponowienie = datetime.datetime.now() + datetime.timedelta(seconds=przerwa)
+
+    def odloz(self, zadanie, blad):
+        """Zapis się nie udał - zadanie trafia do nieudanych (można je ponowić albo odrzucić)."""
+        with self._warunek:
+            self.zadania.remove(zadanie)
+            self.nieudane.append((zadanie, str(blad)))
+            self.ponowienie = None
+            self.wersja += 1
+
+    def nieudane_sesji(self, sesja):
+        """Nieudane zapisy z edycjami sesji `sesja`: lista (zadanie, opis błędu)."""
+        with self._warunek:
+            return [(zadanie, blad) for zadanie, blad in self.nieudane if sesja in zadanie['sesje']]
+
+    def ponow_nieudane(self, sesja):
+        """Wraca do kolejki każde nieudane zadanie z edycjami sesji (razem z edycjami innych, scalonymi w nie)."""
+        with self._warunek:
+            for zadanie, _ in self.nieudane:
+                if sesja in zadanie['sesje']:
+                    zadanie['w_toku'] = False
+                    self.zadania.append(zadanie)
+            self.nieudane = [(zadanie, blad) for zadanie, blad in self.nieudane if sesja not in zadanie['sesje']]
+            self.wersja += 1
+            self._warunek.notify()
+
+    def odrzuc_nieudane(self, sesja):
+        """Sesja rezygnuje ze swoich nieudanych zapisów; zadanie znika, gdy nie chce go już żadna sesja."""
+        with self._warunek:
+            for zadanie, _ in self.nieudane:
+                zadanie['sesje'].discard(sesja)
+            self.nieudane = [(zadanie, blad) for zadanie, blad in self.nieudane if zadanie['sesje']]
+            self.wersja += 1
+
+    def konflikty_sesji(self, sesja):
+        with self._warunek:
+            return list(self.konflikty.get(sesja, []))
+
+    def potwierdz_konflikty(self, sesja):
+        """Sesja przeczytała swoje konflikty - usuwamy je."""
+        with self._warunek:
+            self.konflikty.pop(sesja, None)
+
+    def zamknij(self):
+        """Kończy wątek zapisu (po bieżącym zadaniu)."""
+        with self._warunek:
+            self.zamknieta = True
+            self._warunek.notify_all()
+
+    def naloz(self, df):
+        """Dane z lustra ze zmianami, które jeszcze czekają w kolejce (kolejność jak w arkuszu).
+
+        Nanoszenie jest powtarzalne: zadanie, które właśnie trafiło do
+        arkusza i lustra, a jeszcze nie zniknęło z kolejki, niczego nie dubluje.
+        """
+        with self._warunek:
+            zadania = [(z['rodzaj'], z['dane'], z['baza']) for z in self.zadania]
+        if not zadania:
+            return df
+        for rodzaj, dane, baza in zadania:
+            if rodzaj == 'pelny' or (rodzaj == 'zapis' and baza is None):
+                df = dane
+            elif rodzaj == 'zapis':
+                df, _ = scal_trojstronnie(baza, dane, df, podglad=True)
+            else:
+                nowe = dane
+                df = pd.concat([_do_eksportu(df), nowe[~nowe['id'].isin(df['id'])]], ignore_index=True)
+        return z_eksportu(_do_eksportu(df))
+
+
+def _petla_zapisu(kolejka, lustro):
+    proba = 0
+    while True:
+        zadanie = kolejka.pobierz()
+        if zadanie is None:
+            return
+        stara_wersja = (lustro.wersja, kolejka.wersja)
+        try:
+            polaczenie = get_polaczenie()
+            konflikty = []
+            def utrwal(dane, baza=None):
+                kolejka.utrwal(zadanie, dane, baza)
+
+            with lustro.blokada_arkusza:
+                if zadanie['rodzaj'] == 'dopisz':
+                    df_stan, rewizja, naglowek = _dopisz_w_arkuszu(polaczenie, lustro, zadanie['dane'], utrwal)
+                else:
+                    df_stan, rewizja, naglowek, konflikty = _zapisz_w_arkuszu(
+                        polaczenie, lustro, zadanie['dane'], zadanie['rodzaj'] == 'pelny', zadanie['baza'], utrwal
+                    )
+                if _zgodny_z_arkuszem(polaczenie, df_stan, naglowek):
+                    # Lustro dostaje nasz zapis od razu - bez ponownego pobierania arkusza
+                    lustro.synchronizuj(df_stan, rewizja, naglowek)
+                else:
+                    # Ktoś przestawił wiersze w trakcie zapisu - lokalny stan nie odpowiada arkuszowi
+                    synchronizuj_lustro(lustro, polaczenie, wymus=True)
+            kolejka.zakoncz(zadanie, konflikty)
+            proba = 0
+        except Exception as e:
+            if not do_ponowienia(e):
+                # Może zakładka zmieniła nazwę albo arkusz został podmieniony - przy kolejnej próbie otworzymy go od nowa
+                get_polaczenie().uniewaznij()
+            if do_ponowienia(e) and proba < ZAPIS_MAX_PROB:
+                przerwa = min(2 ** proba, ZAPIS_MAX_PRZERWA)
+                proba += 1
+                kolejka.wstrzymaj(zadanie, przerwa)
+                time.sleep(przerwa)
+                continue
+            kolejka.odloz(zadanie, e)
+            proba = 0
+        uniewaznij_cache(stara_wersja)
+
+
+def get_kolejka_zapisu():
+    """Jedna kolejka zapisów na proces + wątek, który wysyła je do arkusza."""
+    with _zasoby['lock']:
+        if _zasoby['kolejka'] is None:
+            kolejka = KolejkaZapisu()
+            threading.Thread(
+                target=_petla_zapisu, args=(kolejka, get_lustro()), name="zapis-arkusza", daemon=True,
+            ).start()
+            _zasoby['kolejka'] = kolejka
+        return _zasoby['kolejka']
+
+
+def zamknij_zasoby():
+    """Zatrzymuje wątki lustra i kolejki i zapomina je - kolejne get_lustro / get_kolejka_zapisu
+    zbudują nowe (np. z innym LUSTRO_SCIEZKA). Dla benchmarku i testów, nie dla stron."""
+    with _zasoby['lock']:
+        if _zasoby['kolejka'] is not None:
+            _zasoby['kolejka'].zamknij()
+        if _zasoby['lustro'] is not None:
+            _zasoby['lustro'].zatrzymaj.set()
+        _zasoby['lustro'] = _zasoby['kolejka'] = None
+
+
+def biezaca_sesja():
+    """ID sesji Streamlit, z której wołamy (None poza `streamlit run`, np. w benchmarku)."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def zapisz_calosc(df_to_save, pelny=False, df_bazowy=None):
+    """Zleca zapis stanu tabeli do arkusza (używane przy edycji tabeli i w panelu admina).
+
+    Zmiany widać od razu, arkusz dostaje je w tle - patrz _zapisz_w_arkuszu
+    i KolejkaZapisu. `df_bazowy` to dane, na których użytkownik robił zmiany.
+    """
+    baza = None if df_bazowy is None else _do_eksportu(df_bazowy)
+    get_kolejka_zapisu().dodaj('pelny' if pelny else 'zapis', _do_eksportu(df_to_save), baza, biezaca_sesja())
+
+
+def dopisz_wiersze(df_nowe):
+    """Zleca dopisanie nowych transakcji na koniec arkusza.
+
+    Wiersze bez ID (albo z ID 0) dostają kolejne numery od największego ID
+    w danych (razem z czekającymi w kolejce). Zwraca dopisane wiersze.
+    """
+    df_baza = pobierz_dane()
+    max_id = int(df_baza['id'].max()) if not df_baza.empty else 0
+    df_export = _do_eksportu(nadaj_id(df_nowe, max_id))
+    get_kolejka_zapisu().dodaj('dopisz', df_export, sesja=biezaca_sesja())
+    return df_export
+
+
+def dodaj_wiersz(nowy_wiersz_dict):
+    """Dodaje jeden wiersz na koniec (używane w 'Dodaj ręcznie')."""
+    return dopisz_wiersze(pd.DataFrame([nowy_wiersz_dict]))
+
+
+@st.cache_resource
+def licznik_id():
+    """Wspólny dla wszystkich sesji licznik ostatnio wydanego ID."""
+    return {'lock': threading.Lock(), 'ostatnie': 0}
+
+
+def przydziel_id(liczba, max_id):
+    """Rezerwuje `liczba` kolejnych ID większych od `max_id` i od ID wydanych już w tym procesie.
+
+    Dzięki temu dwie sesje zapisujące naraz nie dostaną tych samych numerów.
+    """
+    licznik = licznik_id()
+    with licznik['lock']:
+        start = max(int(max_id), licznik['ostatnie']) + 1
+        licznik['ostatnie'] = start + liczba - 1
+    return np.arange(start, start + liczba, dtype='int64')
+
+
+def nadaj_id(df, max_id):
+    """Nadaje ID wszystkim wierszom bez ID (NaN, 0 albo brak kolumny - np. import CSV) jedną operacją wektorową."""
+    ids = df['id'] if 'id' in df.columns else pd.Series(0, index=df.index)
+    ids = pd.to_numeric(ids, errors='coerce').fillna(0).astype('int64')
+    bez_id = (ids == 0).to_numpy()
+    if bez_id.any():
+        ids[bez_id] = przydziel_id(int(bez_id.sum()), max_id)
+    return df.assign(id=ids.to_numpy())
+
+
+def scal_edycje(df_full, df_przed, df_po):
+    """Łączy wynik edytora z resztą bazy.
+
+    Wiersze, których nie było w edytorze, zostają bez zmian; wiersze usunięte
+    w edytorze znikają; nowe wiersze dostają ID z przydziel_id.
+    """
+    df_tlo = df_full[~df_full['id'].isin(df_przed['id'])]
+    max_id = df_full['id'].max() if not df_full.empty else 0
+    df_zmiany = nadaj_id(df_po.reset_index(drop=True), 0 if pd.isna(max_id) else max_id)
+    df_final = pd.concat([df_tlo, df_zmiany], ignore_index=True)
+    return df_final.sort_values(by='data', ascending=False)
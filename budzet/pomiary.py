@@ -0,0 +1,117 @@
+"""Pomiary czasu operacji i zapytań do Google API (panel admina, logi)."""
+import collections
+import contextlib
+import functools
+import json
+import logging
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+
+LIMIT_ZAPYTAN_NA_MINUTE = 60   # limit Sheets API na użytkownika - osobno dla odczytów i zapisów
+logger_pomiarow = logging.getLogger("budzet.pomiary")
+
+
+class Pomiary:
+    """Czasy i liczniki operacji (API, lustro, pandas, wykresy) do panelu admina.
+
+    Sumy są wspólne dla procesu (wszystkie sesje i wątki w tle). Zdarzenia
+    trafiają też do listy bieżącego przebiegu skryptu, przypiętej do wątku
+    przez rozpocznij_przebieg. Przy `loguj=True` każde zdarzenie idzie do
+    loggera "budzet.pomiary" jako wiersz JSON.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watek = threading.local()
+        self.sumy = {}                          # nazwa -> rodzaj, liczba, czas, max, bajty
+        self.zapytania = collections.deque()    # (czas, 'odczyt' | 'zapis') z ostatniej minuty
+        self.odrzucone = 0                      # odpowiedzi 429 (przekroczony limit)
+        self.loguj = False
+
+    def rozpocznij_przebieg(self, zdarzenia):
+        self._watek.zdarzenia = zdarzenia
+
+    def zapisz(self, nazwa, rodzaj, czas, bajty=0):
+        with self._lock:
+            suma = self.sumy.setdefault(nazwa, {'rodzaj': rodzaj, 'liczba': 0, 'czas': 0.0, 'max': 0.0, 'bajty': 0})
+            suma['liczba'] += 1
+            suma['czas'] += czas
+            suma['max'] = max(suma['max'], czas)
+            suma['bajty'] += bajty
+        zdarzenie = {'nazwa': nazwa, 'rodzaj': rodzaj, 'czas_ms': round(czas * 1000, 1), 'bajty': bajty}
+        zdarzenia = getattr(self._watek, 'zdarzenia', None)
+        if zdarzenia is not None:
+            zdarzenia.append(zdarzenie)
+        if self.loguj:
+            logger_pomiarow.info(json.dumps({**zdarzenie, 'watek': threading.current_thread().name}))
+
+    def odpowiedz_api(self, odpowiedz, *args, **kwargs):
+        """Hook sesji requests: każde zapytanie do Google API (czas, bajty, limit na minutę)."""
+        metoda = odpowiedz.request.method
+        teraz = time.monotonic()
+        with self._lock:
+            self.zapytania.append((teraz, 'odczyt' if metoda == 'GET' else 'zapis'))
+            while self.zapytania[0][0] < teraz - 60:
+                self.zapytania.popleft()
+            if odpowiedz.status_code == 429:
+                self.odrzucone += 1
+        api = 'Drive' if '/drive/' in odpowiedz.url else 'Sheets'
+        self.zapisz(f"HTTP {api} {metoda}", 'http', odpowiedz.elapsed.total_seconds(), len(odpowiedz.content))
+        return odpowiedz
+
+    def ostatnia_minuta(self):
+        """Liczba zapytań do API z ostatnich 60 s: {'odczyt': n, 'zapis': m}."""
+        teraz = time.monotonic()
+        with self._lock:
+            rodzaje = [rodzaj for czas, rodzaj in self.zapytania if czas >= teraz - 60]
+        return {'odczyt': rodzaje.count('odczyt'), 'zapis': rodzaje.count('zapis')}
+
+    def tabela(self):
+        """Sumy dla procesu jako DataFrame (od najdłużej trwających)."""
+        with self._lock:
+            df = pd.DataFrame.from_dict(self.sumy, orient='index')
+        if df.empty:
+            return df
+        df['średnio_ms'] = (df['czas'] / df['liczba'] * 1000).round(1)
+        df['czas_ms'] = (df['czas'] * 1000).round(1)
+        df['max_ms'] = (df['max'] * 1000).round(1)
+        return df[['rodzaj', 'liczba', 'czas_ms', 'średnio_ms', 'max_ms', 'bajty']].sort_values('czas_ms', ascending=False)
+
+    def wyczysc(self):
+        with self._lock:
+            self.sumy = {}
+            self.odrzucone = 0
+
+
+@st.cache_resource
+def get_pomiary():
+    if not logger_pomiarow.handlers:
+        logger_pomiarow.addHandler(logging.StreamHandler())
+        logger_pomiarow.setLevel(logging.INFO)
+        logger_pomiarow.propagate = False
+    return Pomiary()
+
+
+@contextlib.contextmanager
+def mierz(nazwa, rodzaj='pandas'):
+    """Mierzy czas bloku i zapisuje go w get_pomiary()."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_pomiary().zapisz(nazwa, rodzaj, time.perf_counter() - start)
+
+
+def mierzone(nazwa, rodzaj='pandas'):
+    """Dekorator: mierz() wokół całej funkcji."""
+    def dekorator(funkcja):
+        @functools.wraps(funkcja)
+        def opakowana(*args, **kwargs):
+            with mierz(nazwa, rodzaj):
+                return funkcja(*args, **kwargs)
+        return opakowana
+    return dekorator
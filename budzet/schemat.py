@@ -0,0 +1,103 @@
+"""Układ danych: kolumny, słowniki kategorii i banków, normalizacja wartości."""
+import numpy as np
+import pandas as pd
+
+
+KOLUMNY = ['id', 'data', 'kategoria', 'opis', 'kwota', 'bank']
+LISTA_BANKOW = ['ING', 'mBank']
+
+LISTA_KATEGORII = [
+    'Nieistotne', 'Wynagrodzenie', 'Wpływy', 'Elektronika', 'Wyjścia i wydarzenia',
+    'Żywność i chemia domowa', 'Przejazdy', 'Sport i hobby ', 'Wpływy - inne',
+    'Odzież i obuwie', 'Podróże i wyjazdy', 'Rozrywka', 'Zdrowie i uroda',
+    'Regularne oszczędzanie', 'Serwis i części', 'Multimedia, książki i prasa',
+    'Wypłata gotówki', 'Opłaty i odsetki', 'Auto i transport - inne',
+    'Czynsz i wynajem', 'Paliwo', 'Akcesoria i wyposażenie ',
+    'Jedzenie poza domem', 'Prezenty i wsparcie', 'Bez kategorii','ZaMieszkanie'
+]
+KATEGORIA_DOMYSLNA = "Bez kategorii"
+TYP_OPISU = pd.StringDtype("pyarrow", na_value=np.nan)
+
+
+def wyczysc_kwoty(seria):
+    """Zamienia całą kolumnę kwot bankowych na float64 w jednym przebiegu.
+
+    Usuwa waluty (PLN, zł), spacje zwykłe i twarde (\xa0) oraz zamienia
+    przecinek dziesiętny na kropkę. Zwraca parę (kwoty, bledne), gdzie
+    `bledne` to maska wierszy, których nie dało się sparsować - mają kwotę 0.0.
+    """
+    seria = pd.Series(seria)
+
+    # Kolumna już liczbowa - nic do czyszczenia
+    if pd.api.types.is_numeric_dtype(seria) and not pd.api.types.is_bool_dtype(seria):
+        kwoty = seria.astype('float64')
+        return kwoty.fillna(0.0), pd.Series(False, index=seria.index)
+
+    tekst = seria.astype('string')
+    puste = tekst.isna() | (tekst.str.strip() == "")
+
+    tekst = (
+        tekst.str.replace("[\\s\xa0\u202f]*(?:PLN|zł)", "", regex=True)
+        .str.replace("[\\s\xa0\u202f]+", "", regex=True)
+        .str.replace(",", ".", regex=False)
+    )
+    kwoty = pd.to_numeric(tekst, errors='coerce').astype('float64')
+    bledne = (kwoty.isna() & ~puste).astype(bool)
+    return kwoty.fillna(0.0), bledne
+
+
+def jako_tekst(seria):
+    """Kolumna jako zwykłe napisy, braki jako "" (działa też dla kolumn kategorycznych)."""
+    return seria.astype(object).where(seria.notna(), "").astype(str)
+
+
+def uzupelnij_bank(df):
+    """Uzupełnia puste `bank` w starszych wierszach (sprzed kolumny bank).
+
+    Import ING dopisuje do opisu przedrostek "ING ", więc rozpoznajemy go po
+    początku opisu - a nie po "ing" gdziekolwiek (jak "parking" czy "booking").
+    """
+    bank = jako_tekst(df['bank']) if 'bank' in df.columns else pd.Series("", index=df.index)
+    jest_ing = jako_tekst(df['opis']).str.startswith("ING ")
+    return bank.where(bank != "", np.where(jest_ing, "ING", "mBank"))
+
+
+def typuj_kolumny(df):
+    """Zwarte typy w pamięci: `id` int32, `opis` jako napisy Arrow, `kategoria` i `bank` jako Categorical.
+
+    Słownikami kategorii są LISTA_KATEGORII / LISTA_BANKOW; wartości spoza
+    list (np. stare kategorie) są dopisywane na końcu słownika, więc nic nie ginie.
+    """
+    df['id'] = df['id'].astype('int32')
+    # Jeden bufor Arrow zamiast obiektu Pythona na każdy opis (w pandas 3 to domyślny typ "str")
+    df['opis'] = jako_tekst(df['opis']).astype(TYP_OPISU)
+    for kolumna, slownik in (('kategoria', LISTA_KATEGORII), ('bank', LISTA_BANKOW)):
+        wartosci = jako_tekst(df[kolumna])
+        dodatkowe = sorted(set(wartosci.unique()) - set(slownik))
+        df[kolumna] = pd.Categorical(wartosci, categories=list(slownik) + dodatkowe)
+    return df
+
+
+def na_grosze(kwoty):
+    """Kwoty w złotych -> int64 w groszach (stałoprzecinkowo, sumy są dokładne)."""
+    return (pd.to_numeric(kwoty, errors='coerce').fillna(0.0) * 100).round().astype('int64')
+
+
+def suma_kwot(kwoty):
+    """Suma kwot liczona w groszach - bez błędów zaokrągleń floatów przy wielu składnikach."""
+    return int(na_grosze(kwoty).sum()) / 100
+
+
+def odciski_transakcji(df):
+    """Odcisk (int64) każdej transakcji: znormalizowana data, kwota w groszach, opis i bank.
+
+    Kategoria i ID nie wchodzą do odcisku - ta sama operacja z wyciągu ma ten
+    sam odcisk niezależnie od tego, jak ją później skategoryzowano.
+    """
+    klucz = pd.DataFrame({
+        'data': pd.to_datetime(df['data'], errors='coerce').dt.strftime('%Y-%m-%d').fillna(""),
+        'grosze': na_grosze(df['kwota']),
+        'opis': jako_tekst(df['opis']).str.lower().str.split().str.join(" "),
+        'bank': jako_tekst(df['bank']),
+    })
+    return pd.Series(pd.util.hash_pandas_object(klucz, index=False).values.view(np.int64), index=df.index)
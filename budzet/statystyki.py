@@ -0,0 +1,180 @@
+"""Statystyki trendów: miesięczne wydatki na kategorię, średnie kroczące, zmiany m/m, prognoza i budżet."""
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from budzet.magazyn import wczytaj_kostke, widok_wersji
+from budzet.pomiary import mierz
+
+OKNA_KROCZACE = (3, 6, 12)   # średnie z tylu ostatnich miesięcy
+OKNO_PROGNOZY = 3            # tempo wydatków do prognozy - średnia z tylu pełnych miesięcy
+OKNO_BUDZETU = 6             # domyślny budżet kategorii - średnia z tylu pełnych miesięcy
+POZA_WYDATKAMI = [
+    'Nieistotne', 'Bez kategorii', 'Regularne oszczędzanie',
+    'Wpływy', 'Wpływy - inne', 'Wynagrodzenie',
+]
+
+
+def _srednia_kroczaca(kolumna, od, do, okno):
+    """Średnia z `okno` miesięcy kończących się w wierszach od..do (bez pełnego okna - NaN)."""
+    poczatek = max(od - okno + 1, 0)
+    sumy = np.concatenate([[0.0], np.cumsum(kolumna[poczatek:do + 1])])
+    wiersze = np.arange(od, do + 1)
+    koniec = wiersze - poczatek + 1
+    srednie = (sumy[koniec] - sumy[np.maximum(koniec - okno, 0)]) / okno
+    srednie[wiersze < okno - 1] = np.nan
+    return srednie
+
+
+class StatystykiWydatkow:
+    """Miesięczne wydatki (dodatnie kwoty) w siatce miesiąc × kategoria i pochodne serie.
+
+    Siatkę składamy z kostki agregatów, a średnie kroczące i zmiany m/m
+    trzymamy jako tablice tego samego kształtu. Z `poprzednie` (statystyki
+    poprzedniej wersji danych) przepisujemy wszystko, a przeliczamy tylko
+    kategorie, w których zmieniła się któraś suma miesięczna - od pierwszego
+    zmienionego miesiąca do ostatniego okna, które go obejmuje. Nowy wiersz
+    z bieżącego miesiąca przelicza więc kilka komórek, a nie całą historię.
+    """
+
+    def __init__(self, kostka, poprzednie=None):
+        kostka = kostka[(kostka['miesiac'] != "") & ~kostka['kategoria'].isin(POZA_WYDATKAMI)]
+        siatka = -kostka.groupby(['miesiac', 'kategoria'])['suma'].sum().unstack()
+        if not siatka.empty:
+            miesiace = pd.period_range(siatka.index.min(), siatka.index.max(), freq='M')
+            siatka.index = pd.PeriodIndex(siatka.index, freq='M')
+            siatka = siatka.reindex(miesiace)
+        siatka = siatka.fillna(0.0).sort_index(axis=1)
+
+        self.miesiace = pd.PeriodIndex(siatka.index, freq='M')
+        self.kategorie = list(siatka.columns)
+        self.wydatki = siatka.to_numpy('float64')
+        ksztalt = self.wydatki.shape
+
+        if poprzednie is None:
+            zmienione = np.ones(ksztalt, dtype=bool)
+            self.srednie = {okno: np.full(ksztalt, np.nan) for okno in OKNA_KROCZACE}
+            self.zmiana = np.full(ksztalt, np.nan)
+        else:
+            # Poprzednie tablice rozkładamy na nową siatkę; komórki spoza niej są od razu "zmienione"
+            wiersze = self.miesiace.get_indexer(poprzednie.miesiace)
+            kolumny = pd.Index(self.kategorie).get_indexer(poprzednie.kategorie)
+            w, k = wiersze[wiersze >= 0], kolumny[kolumny >= 0]
+            stare_w, stare_k = np.flatnonzero(wiersze >= 0), np.flatnonzero(kolumny >= 0)
+
+            def przenies(tablica):
+                nowa = np.full(ksztalt, np.nan)
+                nowa[np.ix_(w, k)] = tablica[np.ix_(stare_w, stare_k)]
+                return nowa
+
+            stare_wydatki = przenies(poprzednie.wydatki)
+            zmienione = ~(stare_wydatki == self.wydatki)   # NaN (nowe miesiące/kategorie) też się liczy
+            self.srednie = {okno: przenies(poprzednie.srednie[okno]) for okno in OKNA_KROCZACE}
+            self.zmiana = przenies(poprzednie.zmiana)
+            if len(w) and (w[0] != stare_w[0] or np.any(np.diff(w) != 1)):
+                # Historia wydłużyła się wstecz - okna na początku siatki trzeba liczyć od nowa
+                zmienione[:] = True
+
+        self.przeliczone = 0   # ile komórek przeliczono przy tej wersji (do pomiarów)
+        najdluzsze = max(OKNA_KROCZACE)
+        for nr in np.flatnonzero(zmienione.any(axis=0)):
+            wiersze = np.flatnonzero(zmienione[:, nr])
+            od, do = wiersze[0], min(wiersze[-1] + najdluzsze - 1, ksztalt[0] - 1)
+            kolumna = self.wydatki[:, nr]
+            for okno in OKNA_KROCZACE:
+                self.srednie[okno][od:do + 1, nr] = _srednia_kroczaca(kolumna, od, do, okno)
+            self.przeliczone += do - od + 1
+            # Zmiana m/m zależy tylko od miesiąca i poprzedniego
+            do = min(wiersze[-1] + 1, ksztalt[0] - 1)
+            self.zmiana[od:do + 1, nr] = kolumna[od:do + 1] - np.concatenate([[np.nan], kolumna])[od:do + 1]
+
+    def __len__(self):
+        return len(self.miesiace)
+
+    def _kolumny(self, kategorie):
+        """Numery kolumn wybranych kategorii (pusta lista - wszystkie)."""
+        if not kategorie:
+            return np.arange(len(self.kategorie))
+        numery = pd.Index(self.kategorie).get_indexer(kategorie)
+        return numery[numery >= 0]
+
+    def seria(self, kategorie=None):
+        """Ramka miesiąc -> wydatki, średnie kroczące i zmiana m/m, zsumowane po kategoriach.
+
+        Średnie kroczące są liniowe, więc suma średnich kategorii to średnia ich sumy.
+        """
+        kolumny = self._kolumny(kategorie)
+        wynik = pd.DataFrame({
+            'miesiac': self.miesiace.strftime('%Y-%m'),
+            'wydatki': self.wydatki[:, kolumny].sum(axis=1),
+        })
+        for okno in OKNA_KROCZACE:
+            wynik[f'srednia_{okno}'] = _suma_z_nan(self.srednie[okno][:, kolumny])
+        wynik['zmiana'] = _suma_z_nan(self.zmiana[:, kolumny])
+        return wynik
+
+    def _przed_miesiacem(self, miesiac, okno):
+        """Średnia z `okno` pełnych miesięcy przed `miesiac` dla każdej kategorii (brak historii - 0)."""
+        nr = self.miesiace.searchsorted(miesiac)   # pierwszy wiersz >= miesiac
+        if nr == 0:
+            return np.zeros(len(self.kategorie))
+        srednie = self.srednie[okno][nr - 1]
+        if np.isnan(srednie).all():
+            # Krótsza historia niż okno - średnia z tego, co jest
+            return self.wydatki[max(nr - okno, 0):nr].mean(axis=0)
+        return np.nan_to_num(srednie)
+
+    def prognoza(self, dzis):
+        """Stan miesiąca z dniem `dzis` na kategorię: wydano, prognoza na koniec miesiąca i budżet domyślny.
+
+        Prognoza to wydane do dziś plus reszta miesiąca w tempie średniej
+        z ostatnich OKNO_PROGNOZY pełnych miesięcy.
+        """
+        miesiac = pd.Period(dzis, 'M')
+        nr = self.miesiace.get_indexer([miesiac])[0]
+        wydano = self.wydatki[nr] if nr >= 0 else np.zeros(len(self.kategorie))
+        pozostalo = 1 - dzis.day / miesiac.days_in_month
+        tempo = self._przed_miesiacem(miesiac, OKNO_PROGNOZY)
+        wynik = pd.DataFrame({
+            'kategoria': self.kategorie,
+            'wydano': wydano,
+            'prognoza': wydano + tempo * pozostalo,
+            'budzet': np.maximum(self._przed_miesiacem(miesiac, OKNO_BUDZETU), 0).round(-1),
+        })
+        return wynik.round(2)
+
+
+def _suma_z_nan(tablica):
+    """Suma w wierszach; wiersz z samymi NaN (np. brak pełnego okna) zostaje NaN."""
+    suma = np.nansum(tablica, axis=1)
+    suma[np.isnan(tablica).all(axis=1)] = np.nan
+    return suma
+
+
+def budzet_kontra_wydatki(stan, budzety=None, kategorie=None):
+    """Sumy (wydano, prognoza, budżet) bieżącego miesiąca dla wybranych kategorii.
+
+    `budzety` to słownik kategoria -> kwota z ustawień użytkownika; kategorie
+    bez wpisu mają budżet domyślny ze średniej z ostatnich miesięcy.
+    """
+    if kategorie:
+        stan = stan[stan['kategoria'].isin(kategorie)]
+    budzet = stan['kategoria'].map(budzety or {}).fillna(stan['budzet'])
+    return stan['wydano'].sum(), stan['prognoza'].sum(), budzet.sum()
+
+
+@st.cache_resource
+def _ostatnie_statystyki():
+    """Statystyki ostatnio wczytanej wersji danych - kolejna wersja aktualizuje je zamiast liczyć od zera."""
+    return {'lock': threading.Lock(), 'statystyki': None}
+
+
+@widok_wersji
+def wczytaj_statystyki(wersja):
+    """Statystyki wydatków z kostki agregatów. `wersja` służy wyłącznie jako klucz cache."""
+    ostatnie = _ostatnie_statystyki()
+    with ostatnie['lock'], mierz("statystyki trendów"):
+        ostatnie['statystyki'] = StatystykiWydatkow(wczytaj_kostke(wersja), ostatnie['statystyki'])
+        return ostatnie['statystyki']
@@ -0,0 +1,124 @@
+"""Wyszukiwanie transakcji po opisie: odwrócony indeks słów, bez polskich znaków, po przedrostkach."""
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from budzet.magazyn import wczytaj_dane, widok_wersji
+from budzet.pomiary import mierz
+from budzet.schemat import jako_tekst
+
+POLSKIE_ZNAKI = str.maketrans("ąćęłńóśźż", "acelnoszz")
+
+
+def podziel_na_slowa(seria):
+    """Opisy -> listy słów pisanych małymi literami (separatorem jest wszystko poza literami i cyframi)."""
+    tekst = jako_tekst(seria).astype(pd.ArrowDtype(pa.string())).str.lower()
+    return tekst.str.replace(r"[^\pL\pN]+", " ", regex=True).str.split()
+
+
+def normalizuj_slowo(slowo):
+    """Słowo bez znaków diakrytycznych: "żabka" -> "zabka", "café" -> "cafe"."""
+    if slowo.isascii():
+        return slowo
+    slowo = unicodedata.normalize('NFKD', slowo.translate(POLSKIE_ZNAKI))
+    return "".join(znak for znak in slowo if not unicodedata.combining(znak))
+
+
+class IndeksOpisow:
+    """Odwrócony indeks: słowo z opisu -> ID transakcji.
+
+    `slowa` to posortowany słownik, a `id` - ID transakcji ułożone według
+    słowa (od `poczatki[k]` do `poczatki[k + 1]` są transakcje słowa k).
+    Dzięki temu wszystkie słowa o danym przedrostku to jeden ciągły
+    fragment, znajdowany wyszukiwaniem binarnym.
+
+    Z `poprzedni` (indeks poprzedniej wersji danych) przepisujemy wpisy
+    niezmienionych wierszy, a na słowa dzielimy tylko nowe i zmienione opisy.
+    Znaki diakrytyczne usuwamy dopiero z unikalnych słów, nie z każdego opisu.
+    """
+
+    def __init__(self, df, poprzedni=None):
+        ids = pd.to_numeric(df['id'], errors='coerce').fillna(0).to_numpy('int64')
+        sumy = pd.util.hash_pandas_object(
+            pd.DataFrame({'id': ids, 'opis': jako_tekst(df['opis']).to_numpy()}), index=False
+        ).to_numpy()
+
+        if poprzedni is None:
+            nowe = np.ones(len(ids), dtype=bool)
+            slowa, kody, id_wpisow = np.array([], dtype=str), np.array([], dtype='int64'), np.array([], dtype='int64')
+        else:
+            # (pd.Index.isin to tablica haszująca - przy 100k wierszy kilkanaście razy szybsza od np.isin)
+            nowe = ~pd.Index(sumy).isin(poprzedni.sumy)
+            # Wpisy wierszy usuniętych albo ze zmienionym opisem wypadają
+            nieaktualne = poprzedni.ids[~pd.Index(poprzedni.sumy).isin(sumy)]
+            zostaja = ~pd.Index(poprzedni.id).isin(nieaktualne)
+            nowe |= pd.Index(ids).isin(nieaktualne)
+            slowa = poprzedni.slowa
+            kody = np.repeat(np.arange(len(slowa)), np.diff(poprzedni.poczatki))[zostaja]
+            id_wpisow = poprzedni.id[zostaja]
+
+        pary = pd.DataFrame({'id': ids[nowe], 'slowo': podziel_na_slowa(df['opis'][nowe])})
+        pary = pary.explode('slowo')
+        pary = pary[pary['slowo'].notna() & (pary['slowo'] != "")]
+        if not pary.empty:
+            # Słowa zamieniamy na liczby raz; nowe dopisujemy do słownika, a stare kody przeliczamy na pozycje w nowym
+            kody_par, surowe = pd.factorize(pary['slowo'])
+            unikalne, kody_slow = np.unique([normalizuj_slowo(slowo) for slowo in surowe.tolist()], return_inverse=True)
+            wszystkie = np.union1d(slowa, unikalne)
+            pary = pd.DataFrame({
+                'kod': np.searchsorted(wszystkie, unikalne)[kody_slow][kody_par],
+                'id': pary['id'].to_numpy('int64'),
+            })
+            pary = pary.drop_duplicates()
+            kody = np.concatenate([np.searchsorted(wszystkie, slowa)[kody], pary['kod'].to_numpy()])
+            id_wpisow = np.concatenate([id_wpisow, pary['id'].to_numpy()])
+            slowa = wszystkie
+
+        kolejnosc = np.argsort(kody, kind='stable')
+        self.slowa = slowa
+        self.id = id_wpisow[kolejnosc]
+        self.poczatki = np.searchsorted(kody[kolejnosc], np.arange(len(slowa) + 1))
+        self.ids = ids
+        self.sumy = sumy
+
+    def __len__(self):
+        return len(self.slowa)
+
+    def _przedrostek(self, przedrostek):
+        """ID transakcji, których opis ma słowo zaczynające się od `przedrostek`."""
+        od = np.searchsorted(self.slowa, przedrostek, side='left')
+        do = np.searchsorted(self.slowa, przedrostek + "\U0010ffff", side='left')
+        return np.unique(self.id[self.poczatki[od]:self.poczatki[do]])
+
+    def szukaj(self, fraza):
+        """ID transakcji pasujących do każdego słowa frazy (jako przedrostka), posortowane rosnąco.
+
+        Pusta fraza zwraca None - brak filtra.
+        """
+        slowa = [normalizuj_slowo(slowo) for slowo in re.split(r"[\W_]+", fraza.lower()) if slowo]
+        if not slowa:
+            return None
+        wynik = self._przedrostek(slowa[0])
+        for slowo in slowa[1:]:
+            wynik = np.intersect1d(wynik, self._przedrostek(slowo), assume_unique=True)
+        return wynik
+
+
+@st.cache_resource
+def _ostatni_indeks_opisow():
+    """Indeks z ostatnio wczytanej wersji danych - kolejna wersja aktualizuje go zamiast budować od zera."""
+    return {'lock': threading.Lock(), 'indeks': None}
+
+
+@widok_wersji
+def wczytaj_indeks_opisow(wersja):
+    """Indeks opisów dla danych z pobierz_dane. `wersja` służy wyłącznie jako klucz cache."""
+    ostatni = _ostatni_indeks_opisow()
+    with ostatni['lock'], mierz("indeks opisów"):
+        ostatni['indeks'] = IndeksOpisow(wczytaj_dane(wersja), ostatni['indeks'])
+        return ostatni['indeks']
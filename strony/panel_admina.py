@@ -0,0 +1,117 @@
+"""Strona 4: Panel admina (podgląd surowych danych, naprawy, pomiary)."""
+import pandas as pd
+import streamlit as st
+
+from budzet.edytor import stronicuj
+from budzet.magazyn import get_lustro, licznik_id, pobierz_dane, zapisz_calosc
+from budzet.pomiary import LIMIT_ZAPYTAN_NA_MINUTE, get_pomiary
+from budzet.schemat import KOLUMNY
+
+df_full = pobierz_dane()
+
+st.title("🔧 Panel Administracyjny")
+st.warning("⚠️ Tutaj operujesz na żywych danych. Każda zmiana jest zapisywana w Google Sheets!")
+
+# 1. Statystyki bazy
+st.subheader("1. Status bazy danych")
+col1, col2, col3 = st.columns(3)
+col1.metric("Liczba wierszy", len(df_full))
+col2.metric("Najwyższe ID", df_full['id'].max() if not df_full.empty else 0)
+col3.metric("Ostatnia data", str(df_full['data'].max().date()) if not df_full.empty else "-")
+
+lustro = get_lustro()
+st.caption(
+    f"Lokalne lustro: wersja {lustro.wersja}, rewizja arkusza {lustro.rewizja}, "
+    f"ostatnia synchronizacja {lustro.ostatnia_synchronizacja:%H:%M:%S}" if lustro.ostatnia_synchronizacja
+    else f"Lokalne lustro: wersja {lustro.wersja}, rewizja arkusza {lustro.rewizja}"
+)
+if lustro.ostatni_blad:
+    st.error(f"Synchronizacja w tle nie powiodła się: {lustro.ostatni_blad}")
+if lustro.bledne_kwoty:
+    st.warning(f"Nieczytelne kwoty w arkuszu (zapisane jako 0.00) - ID: {lustro.bledne_kwoty}")
+
+# 2. Pełny podgląd
+st.subheader("2. Pełny podgląd danych (Raw Data)")
+_, df_strona_admin = stronicuj(df_full, "admin_podglad")
+st.dataframe(df_strona_admin, use_container_width=True)
+
+st.divider()
+
+# 3. Usuwanie po ID
+st.subheader("3. Usuwanie wiersza po ID")
+col_del1, col_del2 = st.columns([1, 2])
+with col_del1:
+    id_do_usuniecia = st.number_input("Podaj ID do usunięcia", step=1, value=0)
+
+with col_del2:
+    st.write("")
+    st.write("")
+    if st.button("🗑️ Usuń ten wiersz trwale"):
+        if id_do_usuniecia in df_full['id'].values:
+            # Filtrujemy, usuwając to ID
+            df_po_usunieciu = df_full[df_full['id'] != id_do_usuniecia]
+            zapisz_calosc(df_po_usunieciu, df_bazowy=df_full)
+            st.success(f"Usunięto wiersz o ID: {id_do_usuniecia}")
+            st.rerun()
+        else:
+            st.error("Nie znaleziono takiego ID.")
+
+st.divider()
+
+# Migracja układu arkusza (np. dodanie kolumny bank)
+if set(lustro.naglowek) != set(KOLUMNY):
+    st.subheader("🧩 Migracja arkusza")
+    brakujace = [k for k in KOLUMNY if k not in lustro.naglowek]
+    st.info(f"W arkuszu brakuje kolumn: {', '.join(brakujace)}. Dane są uzupełniane w aplikacji, "
+            "ale zapis różnicowy wymaga pełnego układu kolumn.")
+    if st.button("🧩 Uzupełnij kolumny w arkuszu"):
+        zapisz_calosc(df_full, pelny=True)
+        st.success("Arkusz ma teraz komplet kolumn.")
+        st.rerun()
+    st.divider()
+
+# 4. Naprawa struktury (To naprawi Twój problem z ID i datami)
+st.subheader("4. 🛠️ Naprawa ID i Kolejności")
+st.info("Ta funkcja posortuje wszystkie transakcje od najstarszej do najnowszej i nada im nowe ID po kolei (1, 2, 3...). Użyj tego, jeśli masz bałagan w numeracji.")
+
+if st.button("♻️ Przeindeksuj całą bazę"):
+    try:
+        # Sortujemy chronologicznie (sort_values i tak zwraca nową ramkę - bez osobnej kopii)
+        df_fix = df_full.sort_values(by='data', ascending=True)
+        # Nadajemy nowe ID od 1 do N
+        df_fix['id'] = range(1, len(df_fix) + 1)
+        # Sortujemy z powrotem od najnowszej (żeby w tabeli było wygodnie)
+        df_fix = df_fix.sort_values(by='data', ascending=False)
+        
+        zapisz_calosc(df_fix, pelny=True)
+        # ID zaczynają się od nowa - zapomniane są też numery wydane wcześniej
+        licznik_id.clear()
+        st.success("Baza naprawiona! ID są teraz po kolei wg dat.")
+        st.rerun()
+    except Exception as e:
+        st.error(f"Błąd: {e}")
+
+st.divider()
+
+# 5. Pomiary wydajności - gdzie idzie czas: sieć, lustro, pandas czy rysowanie
+st.subheader("5. 📈 Pomiary wydajności")
+pomiary = get_pomiary()
+minuta = pomiary.ostatnia_minuta()
+c1, c2, c3 = st.columns(3)
+c1.metric("Odczyty API / min", f"{minuta['odczyt']} / {LIMIT_ZAPYTAN_NA_MINUTE}")
+c2.metric("Zapisy API / min", f"{minuta['zapis']} / {LIMIT_ZAPYTAN_NA_MINUTE}")
+c3.metric("Odrzucone (429)", pomiary.odrzucone)
+
+przebieg = pd.DataFrame(st.session_state.get('ostatni_przebieg', []), columns=['nazwa', 'rodzaj', 'czas_ms', 'bajty'])
+st.write(f"Poprzedni przebieg strony: {przebieg['czas_ms'].sum():.0f} ms w {len(przebieg)} pomiarach")
+if not przebieg.empty:
+    st.dataframe(przebieg.groupby('rodzaj')[['czas_ms', 'bajty']].sum(), use_container_width=True)
+    st.dataframe(przebieg, use_container_width=True, hide_index=True)
+
+st.write("Od startu serwera (wszystkie sesje i wątki w tle):")
+st.dataframe(pomiary.tabela(), use_container_width=True)
+
+pomiary.loguj = st.checkbox("Zapisuj pomiary w logach (JSON, logger budzet.pomiary)", value=pomiary.loguj)
+if st.button("🧹 Wyzeruj pomiary"):
+    pomiary.wyczysc()
+    st.rerun()
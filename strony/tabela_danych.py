@@ -0,0 +1,223 @@
+"""Strona 1: Tabela danych (import CSV, przegląd i edycja)."""
+import datetime
+import traceback
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from budzet.agregacje import FiltrTransakcji, zakres_z_wyboru
+from budzet.edytor import edytor_stron, nowe_wiersze_stron, odrzuc_zmiany_stron, stronicuj, zmiany_stron
+from budzet.importy import oznacz_duplikaty, przetworz_wyciagi, wczytaj_reguly
+from budzet.magazyn import (
+    dane_strony, dopisz_wiersze, scal_edycje, wczytaj_indeks_dat, wczytaj_odciski, zapisz_calosc,
+)
+from budzet.pomiary import mierz
+from budzet.schemat import KATEGORIA_DOMYSLNA, LISTA_BANKOW, LISTA_KATEGORII, suma_kwot
+from budzet.statystyki import budzet_kontra_wydatki, wczytaj_statystyki
+from budzet.wyszukiwanie import wczytaj_indeks_opisow
+
+df_full, wersja = dane_strony()
+indeks_dat = wczytaj_indeks_dat(wersja)
+selected_banks = st.session_state['wybrane_banki']
+
+# --- SEKCJA IMPORTU CSV ---
+with st.expander("📥 Wgraj wyciągi z banku (CSV)"):
+    uploaded_files = st.file_uploader(
+        "Wybierz pliki CSV (mBank / ING) - można kilka naraz", type="csv", accept_multiple_files=True
+    )
+    
+    if uploaded_files:
+        file_key = "csv_data_" + "|".join(sorted(f"{plik.name}:{plik.size}" for plik in uploaded_files))
+        
+        if file_key not in st.session_state:
+            # Podgląd poprzedniego zestawu plików nie będzie już potrzebny
+            for klucz in [k for k in st.session_state if str(k).startswith("csv_data_")]:
+                del st.session_state[klucz]
+            st.write("Przetwarzanie plików...")
+            # Wszystkie pliki naraz (osobne procesy), połączone i bez powtórzeń między plikami
+            df_new = przetworz_wyciagi([(plik.name, plik.getvalue()) for plik in uploaded_files])
+            if not df_new.empty:
+                # Kategorie podpowiadamy z historii - zostaje do poprawienia tylko reszta
+                bez_kategorii = (df_new['kategoria'] == KATEGORIA_DOMYSLNA).sum()
+                df_new['kategoria'] = wczytaj_reguly(wersja).przypisz(df_new)
+                df_new.attrs['skategoryzowane'] = int(bez_kategorii - (df_new['kategoria'] == KATEGORIA_DOMYSLNA).sum())
+            st.session_state[file_key] = df_new
+        
+        # Pobieramy dane z sesji
+        df_to_add = st.session_state[file_key]
+        
+        if df_to_add.attrs.get('bledne_kwoty'):
+            st.warning(
+                f"Nie udało się odczytać kwoty w {len(df_to_add.attrs['bledne_kwoty'])} wierszach "
+                f"(przyjęto 0.00): {df_to_add.attrs['bledne_kwoty']}"
+            )
+
+        pliki = pd.DataFrame(df_to_add.attrs.get('pliki', []), columns=['plik', 'bank', 'transakcje'])
+        nieznane = pliki.loc[pliki['bank'].isna(), 'plik'].tolist()
+        if nieznane and len(nieznane) < len(pliki):
+            st.warning(f"Pominięte pliki (pusty lub nieznany format): {', '.join(nieznane)}")
+
+        if not df_to_add.empty:
+            # Wyciągi z kolejnych miesięcy nachodzą na siebie - sprawdzamy odciski z bazy
+            duplikaty = oznacz_duplikaty(df_to_add, wczytaj_odciski(wersja))
+            df_nowe = df_to_add[~duplikaty]
+
+            st.write("Podgląd:")
+            if len(pliki) > 1:
+                st.dataframe(pliki, hide_index=True)
+            st.caption(
+                f"Nowe transakcje: {len(df_nowe)}, już w bazie (pominięte): {int(duplikaty.sum())}"
+                + (f", powtórzone w kilku plikach (pominięte): {df_to_add.attrs['powtorzone']}"
+                   if df_to_add.attrs.get('powtorzone') else "")
+            )
+            if df_to_add.attrs.get('skategoryzowane'):
+                st.caption(f"🏷️ Kategorie przypisane automatycznie z historii: {df_to_add.attrs['skategoryzowane']}")
+            st.dataframe(df_to_add.assign(status=np.where(duplikaty, "już w bazie", "nowa")))
+
+            if df_nowe.empty:
+                st.info("Wszystkie transakcje z tych plików są już w bazie.")
+
+            # Przycisk korzysta teraz z danych w session_state, a nie z pliku
+            elif st.button("🔥 Dodaj te transakcje do chmury"):
+                try:
+                    # Same nowe wiersze ze wszystkich plików - jedno dopisanie na koniec arkusza (ID nadaje dopisz_wiersze)
+                    df_upload = dopisz_wiersze(df_nowe)
+                    st.success(f"Dodano {len(df_upload)} transakcji!")
+
+                    # Czyścimy dane z sesji po udanym zapisie, żeby nie dodać ich 2 razy
+                    del st.session_state[file_key]
+
+                    # Odświeżamy aplikację
+                    st.rerun()
+
+                except Exception as e:
+                    st.error(f"Wystąpił błąd podczas zapisu: {e}")
+                    st.write(traceback.format_exc()) # Pokaże dokładny błąd
+        else:
+            st.error("Pliki są puste lub mają nieznany format.")
+
+st.divider()
+st.subheader("📝 Edycja i Przegląd Wydatków")
+
+# --- FILTRY I DATY (Twoja logika z session_state) ---
+def ustaw_obecny_miesiac():
+    dzisiaj = datetime.date.today()
+    pierwszy_dzien = dzisiaj.replace(day=1)
+    st.session_state['wybrane_daty'] = (pierwszy_dzien, dzisiaj)
+
+if 'wybrane_daty' not in st.session_state:
+    # Domyślnie obecny miesiąc
+    dzisiaj = datetime.date.today()
+    pierwszy = dzisiaj.replace(day=1)
+    st.session_state['wybrane_daty'] = (pierwszy, dzisiaj)
+
+# Szukanie po opisie idzie przez indeks słów (bez polskich znaków, po początkach słów), nie przez str.contains
+fraza = st.text_input("🔍 Szukaj w opisie", placeholder="np. biedr, orlen paliwo", key="szukaj_opis")
+znalezione = wczytaj_indeks_opisow(wersja).szukaj(fraza)
+
+col_f1, col_f2, col_f3 = st.columns([2, 2, 1])
+
+with col_f1:
+    filtry_kat = st.multiselect("Kategorie", LISTA_KATEGORII)
+
+with col_f2:
+    date_range = st.date_input("Zakres dat", key="wybrane_daty")
+
+with col_f3:
+    st.write("")
+    st.write("")
+    st.button("📅 Ten miesiąc", on_click=ustaw_obecny_miesiac)
+
+# Zakres dat wycinamy binarnie z posortowanego indeksu, bank i kategorie to jedna maska na wycinku -
+# widok (od najnowszych) powstaje raz, bez kopii danych po każdym filtrze
+filtr = FiltrTransakcji(df_full, indeks_dat).okres(zakres_z_wyboru(date_range)).kategorie(filtry_kat)
+if len(selected_banks) == 1:
+    filtr.banki(selected_banks)
+df_view = filtr.tylko_id(znalezione).wynik(malejaco=True)
+
+if znalezione is not None:
+    st.caption(f"Pasujące do „{fraza}”: {len(znalezione)} transakcji, z tego w wybranym widoku: {len(df_view)}")
+
+st.markdown("---")
+# Sumy w groszach - dokładne niezależnie od liczby transakcji w widoku
+suma_widoczna = suma_kwot(
+    df_view.loc[~df_view['kategoria'].isin(["Bez kategorii", "Regularne oszczędzanie",'Nieistotne']), 'kwota']
+)
+Wpływy = suma_kwot(df_view.loc[df_view['kategoria'].isin(["Wpływy", "Wynagrodzenie", "Wpływy - inne"]), 'kwota'])
+Wydatki = -suma_kwot(df_view.loc[~df_view['kategoria'].isin(["Wpływy", "Wynagrodzenie", "Wpływy - inne","Bez kategorii", "Regularne oszczędzanie",'Nieistotne']), 'kwota'])
+c1, c2, c3, c4 = st.columns(4)
+with c1:
+    if suma_widoczna >= 0:
+        st.metric("💰 Suma wpływów", f"{suma_widoczna:.2f} PLN")
+    else:
+        st.metric("💸 Suma wydatków", f"{suma_widoczna:.2f} PLN")
+with c2:
+    st.metric("🧾 Wpływy", f"{Wpływy:.2f} PLN")
+with c3:
+    st.metric("📊 Wydatki", f"{Wydatki:.2f} PLN")
+with c4:
+    # Bieżący miesiąc (oba banki) w wybranych kategoriach - niezależnie od zakresu dat w filtrze
+    wydano, prognoza, budzet = budzet_kontra_wydatki(
+        wczytaj_statystyki(wersja).prognoza(datetime.date.today()),
+        st.session_state.get('budzety'), filtry_kat,
+    )
+    st.metric(
+        "🎯 Budżet miesiąca", f"{wydano:.0f} / {budzet:.0f} PLN",
+        delta=f"prognoza {prognoza:.0f} PLN ({prognoza - budzet:+.0f})", delta_color="off" if prognoza <= budzet else "inverse",
+        help="Wydatki w tym miesiącu względem budżetu; budżety i prognoza na stronie Trendy i budżet.",
+    )
+st.markdown("---")
+
+
+# Do przeglądarki trafia tylko jedna strona; zmiany z kolejnych stron łączymy przy zapisie
+nr_strony, df_strona = stronicuj(df_view, "editor_glowny")
+podpis_widoku = (zakres_z_wyboru(date_range), tuple(selected_banks), tuple(filtry_kat), fraza)
+with mierz("edytor tabeli", 'render'):
+    edytor_stron(
+        "editor_glowny", nr_strony, df_strona, podpis_widoku,
+        column_order=["data", "kategoria", "opis", "kwota", "bank"],
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,  
+        column_config={
+            "kwota": st.column_config.NumberColumn("Kwota (PLN)", format="%.2f", step=0.01),
+            "data": st.column_config.DateColumn("Data", format="YYYY-MM-DD"),
+            "kategoria": st.column_config.SelectboxColumn("Kategoria", options=LISTA_KATEGORII, required=True),
+            "bank": st.column_config.SelectboxColumn("Bank", options=LISTA_BANKOW)
+        }
+    )
+zmiany = zmiany_stron("editor_glowny")
+if len(zmiany) > 1:
+    st.caption(f"Niezapisane zmiany na {len(zmiany)} stronach - zostaną zapisane razem.")
+
+if st.button("💾 Zapisz zmiany w chmurze"):
+    try:
+        # Jeśli tylko dopisano wiersze - jeden append_rows zamiast przeliczania całej tabeli
+        nowe_wiersze = nowe_wiersze_stron("editor_glowny")
+        if not zmiany:
+            st.info("Brak zmian do zapisania.")
+        elif nowe_wiersze is not None:
+            dopisz_wiersze(nowe_wiersze)
+            odrzuc_zmiany_stron("editor_glowny")
+            st.success(f"✅ Dopisano {len(nowe_wiersze)} nowych wierszy!")
+            st.rerun()
+        else:
+            # Tło (wiersze spoza edytowanych stron: inne banki, daty, kategorie) zostaje nietknięte,
+            # usunięte w edytorze znikają, a nowe wiersze dostają ID
+            # Baza = to, co użytkownik widział na edytowanych stronach (mogło się od tego czasu zmienić)
+            df_bazowy, df_final = df_full, df_full
+            for df_przed, df_po in zmiany:
+                df_bazowy = scal_edycje(df_bazowy, df_przed, df_przed)
+                df_final = scal_edycje(df_final, df_przed, df_po)
+        
+            # Zapisz (tylko różnice, z dołączeniem cudzych zmian zapisanych w międzyczasie)
+            zapisz_calosc(df_final, df_bazowy=df_bazowy)
+            odrzuc_zmiany_stron("editor_glowny")
+        
+            st.success("✅ Zapisano bezpiecznie! (Ukryte dane innych banków/dat zostały zachowane)")
+            st.rerun()
+        
+    except Exception as e:
+        st.error(f"Błąd zapisu: {e}")
+        st.write(traceback.format_exc())
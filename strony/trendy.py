@@ -0,0 +1,102 @@
+"""Strona 4: Trendy wydatków i budżet bieżącego miesiąca."""
+import datetime
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from budzet.magazyn import dane_strony
+from budzet.pomiary import mierz
+from budzet.statystyki import OKNA_KROCZACE, OKNO_BUDZETU, OKNO_PROGNOZY, budzet_kontra_wydatki, wczytaj_statystyki
+
+df_full, wersja = dane_strony()
+
+st.title("📈 Trendy i budżet")
+
+if df_full.empty:
+    st.info("Brak danych do wykresu.")
+    st.stop()
+
+# Statystyki są liczone z kostki agregatów i aktualizowane tylko dla zmienionych miesięcy
+statystyki = wczytaj_statystyki(wersja)
+dzisiaj = datetime.date.today()
+
+filtry_kat = st.multiselect("Kategorie", statystyki.kategorie, key="trendy_kategorie")
+
+# --- WYKRES: sumy miesięczne + średnie kroczące ---
+seria = statystyki.seria(filtry_kat)
+if len(seria) > 36:
+    seria = seria.tail(36)   # ostatnie 3 lata - starsze średnie i tak są w 12-miesięcznej
+
+srednie = seria.melt(
+    id_vars='miesiac', value_vars=[f'srednia_{okno}' for okno in OKNA_KROCZACE],
+    var_name='seria', value_name='kwota',
+).dropna()
+srednie['seria'] = srednie['seria'].str.replace('srednia_', 'średnia ') + " mies."
+
+slupki = alt.Chart(seria).mark_bar(color="#720094", opacity=0.5).encode(
+    x=alt.X('miesiac:N', title='Miesiąc'),
+    y=alt.Y('wydatki:Q', title='Wydatki (PLN)'),
+    tooltip=[
+        alt.Tooltip('miesiac:N', title='Miesiąc'),
+        alt.Tooltip('wydatki:Q', title='Wydatki', format='.2f'),
+        alt.Tooltip('zmiana:Q', title='Zmiana m/m', format='+.2f'),
+    ]
+)
+linie = alt.Chart(srednie).mark_line(point=True).encode(
+    x='miesiac:N',
+    y='kwota:Q',
+    color=alt.Color('seria:N', title='Średnia krocząca'),
+    tooltip=[alt.Tooltip('seria:N'), alt.Tooltip('kwota:Q', format='.2f')]
+)
+
+with mierz("wykres: trendy", 'render'):
+    st.altair_chart((slupki + linie).properties(title='Wydatki miesięczne i średnie kroczące'), use_container_width=True)
+
+# --- BUDŻET BIEŻĄCEGO MIESIĄCA ---
+st.divider()
+st.subheader(f"🎯 Budżet: {dzisiaj:%Y-%m}")
+st.caption(
+    f"Prognoza = wydane do dziś + reszta miesiąca w tempie średniej z {OKNO_PROGNOZY} pełnych miesięcy. "
+    f"Budżet domyślny to średnia z {OKNO_BUDZETU} miesięcy - można go zmienić w tabeli."
+)
+
+stan = statystyki.prognoza(dzisiaj)
+budzety = st.session_state.setdefault('budzety', {})
+wydano, prognoza, budzet = budzet_kontra_wydatki(stan, budzety, filtry_kat)
+stan['budzet'] = stan['kategoria'].map(budzety).fillna(stan['budzet'])
+
+c1, c2, c3 = st.columns(3)
+c1.metric("💸 Wydano", f"{wydano:.2f} PLN")
+c2.metric("🔮 Prognoza na koniec miesiąca", f"{prognoza:.2f} PLN",
+          delta=f"{prognoza - budzet:+.2f} PLN względem budżetu", delta_color="inverse")
+c3.metric("🎯 Budżet", f"{budzet:.2f} PLN")
+
+widok = stan[stan['kategoria'].isin(filtry_kat)] if filtry_kat else stan
+widok = widok.assign(
+    wykorzystanie=(widok['prognoza'] / widok['budzet'].where(widok['budzet'] > 0)).fillna(0.0)
+).sort_values('prognoza', ascending=False)
+
+# Klucz zależy od kolejności wierszy - inaczej poprawki edytora trafiłyby do innych kategorii
+edytowane = st.data_editor(
+    widok,
+    key=f"editor_budzetu_{hash(tuple(widok['kategoria']))}",
+    hide_index=True,
+    use_container_width=True,
+    disabled=['kategoria', 'wydano', 'prognoza', 'wykorzystanie'],
+    column_config={
+        "kategoria": st.column_config.TextColumn("Kategoria"),
+        "wydano": st.column_config.NumberColumn("Wydano (PLN)", format="%.2f"),
+        "prognoza": st.column_config.NumberColumn("Prognoza (PLN)", format="%.2f"),
+        "budzet": st.column_config.NumberColumn("Budżet (PLN)", format="%.2f", min_value=0.0, step=10.0),
+        "wykorzystanie": st.column_config.ProgressColumn(
+            "Prognoza / budżet", format="percent", min_value=0.0, max_value=1.5
+        ),
+    },
+)
+
+# Zmienione budżety zapamiętujemy w sesji - korzysta z nich też wskaźnik na stronie z tabelą
+zmienione = edytowane.set_index('kategoria')['budzet'] != widok.set_index('kategoria')['budzet']
+if zmienione.any():
+    budzety.update(pd.to_numeric(edytowane.set_index('kategoria')['budzet'][zmienione]).fillna(0.0).to_dict())
+    st.rerun()
@@ -0,0 +1,149 @@
+"""Strona 3: Wydatki według kategorii."""
+import datetime
+
+import altair as alt
+import streamlit as st
+
+from budzet.agregacje import FiltrTransakcji, zakres_z_wyboru, zsumuj_wydatki
+from budzet.edytor import tylko_nowe_wiersze
+from budzet.magazyn import (
+    dane_strony, dopisz_wiersze, scal_edycje, wczytaj_indeks_dat, wczytaj_kostke, zapisz_calosc,
+)
+from budzet.pomiary import mierz
+from budzet.schemat import LISTA_BANKOW, LISTA_KATEGORII, suma_kwot
+
+df_full, wersja = dane_strony()
+indeks_dat = wczytaj_indeks_dat(wersja)
+
+st.title("📊 Analiza wydatków według kategorii")
+
+def ustaw_obecny_m():
+    dzisiaj=datetime.date.today()
+    pierwyszy_dzine=dzisiaj.replace(day=1)
+    st.session_state['wybrane_daty'] = (pierwyszy_dzine, dzisiaj)
+
+
+
+col_f1, col_f2, col_f3 = st.columns([2, 2, 1])
+with col_f1:
+    filtry_kat = st.multiselect("Kategorie", LISTA_KATEGORII)
+with col_f2:
+    date_range = st.date_input("Zakres dat", key="wybrane_daty")
+with col_f3:
+    st.write("")
+    st.write("")
+    st.button("📅 Ten miesiąc", on_click=ustaw_obecny_m)
+
+if 'wybrane_daty' not in st.session_state:
+    dzis=datetime.date.today()
+    pierwszy_month=dzis.replace(month=1,day=1)
+    st.session_state['wybrane_daty']=(pierwszy_month,dzis)
+
+
+if df_full.empty:
+    st.info("Brak danych do wykresu.")
+else:
+    # Filtrowanie kategorii technicznych
+    zakres = zakres_z_wyboru(date_range)
+    wykluczone = [
+        'Nieistotne', 'Bez kategorii', 'Regularne oszczędzanie',
+        'Wpływy', 'Wpływy - inne', 'Wynagrodzenie'
+    ]
+
+    # Agregacja z kostki i SORTOWANIE
+    df_plot = zsumuj_wydatki(
+        df_full, wczytaj_kostke(wersja), zakres, wykluczone, filtry_kat, 'kategoria', indeks_dat
+    )
+    df_plot['kwota'] = -df_plot['kwota']
+    df_plot = df_plot.sort_values('kwota', ascending=False)
+
+    klikniecie = alt.selection_point(fields=['kategoria'], name="klik")
+
+    chart = alt.Chart(df_plot).mark_bar(color="#720094").encode(
+        x=alt.X('kwota:Q', title='Suma (PLN)'),
+        y=alt.Y('kategoria:N',
+            sort=alt.EncodingSortField(field='kwota', order='descending'),
+            title='Kategoria',
+            axis=alt.Axis(labelLimit=400)
+        ),
+        # Sprawiamy, że nieaktywne słupki będą szare (wizualne potwierdzenie kliknięcia)
+        opacity=alt.condition(klikniecie, alt.value(1), alt.value(0.3)),
+        tooltip=[
+            alt.Tooltip('kategoria:N', title='Kategoria'),
+            alt.Tooltip('kwota:Q', title='Kwota', format='.2f')
+        ]
+    ).add_params(
+        klikniecie 
+    ).properties(
+        title='Kliknij na słupek, aby zobaczyć szczegóły',
+        width=800
+    )
+
+    # --- 4. WYŚWIETLANIE ---
+    # Nadal używamy on_select="rerun", żeby odświeżyć stronę po kliknięciu
+    with mierz("wykres: kategorie", 'render'):
+        event = st.altair_chart(
+            chart,
+            use_container_width=True,
+            on_select="rerun" 
+        )
+
+    # --- 5. ODCZYT DANYCH ---
+    wybrany_przedzial = None
+
+    # Sprawdzamy czy w zwróconym obiekcie 'selection' istnieje nasz nazwany selektor "klik"
+    if event.selection and "klik" in event.selection:
+        # event.selection["klik"] to lista słowników, np. [{'kategoria': 'Jedzenie'}]
+        dane_wyboru = event.selection["klik"]
+        if dane_wyboru:
+            wybrany_przedzial = dane_wyboru[0]["kategoria"]
+
+        # --- 6. TABELA SZCZEGÓŁÓW ---
+        if wybrany_przedzial:
+            st.divider()
+            st.markdown(f"### 🔍 Szczegóły: **{wybrany_przedzial}**")
+            
+            szczegoly = (
+                FiltrTransakcji(df_full, indeks_dat)
+                .okres(zakres).bez_kategorii(wykluczone).kategorie(filtry_kat).kategorie([wybrany_przedzial])
+                .wynik(malejaco=True)
+            )
+            
+            sum_kat = suma_kwot(szczegoly['kwota'])
+            st.caption(f"Łączna suma w tym widoku: {-sum_kat:.2f} PLN")
+
+            df_edited_result = st.data_editor(
+            szczegoly,
+            column_order=["data", "kategoria", "opis", "kwota", "bank"],
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,  
+            key="editor_glowny",
+            column_config={
+                "kwota": st.column_config.NumberColumn("Kwota (PLN)", format="%.2f", step=0.01),
+                "data": st.column_config.DateColumn("Data", format="YYYY-MM-DD"),
+                "kategoria": st.column_config.SelectboxColumn("Kategoria", options=LISTA_KATEGORII, required=True),
+                "bank": st.column_config.SelectboxColumn("Bank", options=LISTA_BANKOW)
+            }
+        )
+
+            if st.button("💾 Zapisz zmiany w chmurze"):
+                try:
+                    # Jeśli tylko dopisano wiersze - jeden append_rows zamiast przeliczania całej tabeli
+                    nowe_wiersze = tylko_nowe_wiersze("editor_glowny", df_edited_result)
+                    if nowe_wiersze is not None:
+                        dopisz_wiersze(nowe_wiersze)
+                        st.success(f"✅ Dopisano {len(nowe_wiersze)} nowych wierszy!")
+                        st.rerun()
+                    else:
+                        # Usunięte w edytorze znikają, zmienione są podmieniane, nowe dostają ID
+                        df_final = scal_edycje(df_full, szczegoly, df_edited_result)
+                    
+                        zapisz_calosc(df_final, df_bazowy=df_full)
+                    
+                        st.success("✅ Zapisano! (Uwzględniono edycję, dodawanie i usuwanie)")
+                        st.rerun()
+                    
+                except Exception as e:
+                    st.error(f"Błąd zapisu: {e}")
+                    # Pokaż szczegóły błędu do debugowania
@@ -0,0 +1,112 @@
+"""Atrapa gspread w pamięci - dla testów i benchmark.py."""
+import types
+
+import gspread
+
+
+class FakeArkusz:
+    """Arkusz + zakładka w pamięci; liczy wywołania API (`zapytania`)."""
+
+    id = 0
+
+    def __init__(self, wiersze):
+        self.wiersze = [list(w) for w in wiersze]
+        self.zapytania = []
+        self._rewizja = 0
+        # Nazwa zapisu (np. "append_rows"), który raz się wykona, a mimo to zwróci 503
+        self.awaria_po = None
+        # Funkcja(arkusz) wołana raz po najbliższym zapisie - np. ktoś sortuje arkusz zaraz po nas
+        self.po_zapisie = None
+
+    def _zmiana(self):
+        self._rewizja += 1
+        if self.po_zapisie is not None:
+            zmiana, self.po_zapisie = self.po_zapisie, None
+            zmiana(self)
+        if self.awaria_po is not None and self.zapytania[-1] == self.awaria_po:
+            self.awaria_po = None
+            raise blad_serwera(503)
+
+    # --- Spreadsheet ---
+    def worksheet(self, nazwa):
+        self.zapytania.append("worksheet")
+        return self
+
+    def get_lastUpdateTime(self):
+        self.zapytania.append("get_lastUpdateTime")
+        return f"rewizja-{self._rewizja}"
+
+    def batch_update(self, body):
+        self.zapytania.append("batch_update")
+        for zadanie in body["requests"]:
+            if "updateCells" in zadanie:
+                z = zadanie["updateCells"]
+                wiersz, kolumna = z["start"]["rowIndex"], z["start"]["columnIndex"]
+                self.wiersze[wiersz][kolumna] = self._wartosc(z["rows"][0]["values"][0])
+            elif "deleteDimension" in zadanie:
+                zakres = zadanie["deleteDimension"]["range"]
+                del self.wiersze[zakres["startIndex"]:zakres["endIndex"]]
+            elif "appendCells" in zadanie:
+                for w in zadanie["appendCells"]["rows"]:
+                    self.wiersze.append([self._wartosc(k) for k in w["values"]])
+        self._zmiana()
+
+    @staticmethod
+    def _wartosc(komorka):
+        wartosc = komorka["userEnteredValue"]
+        return wartosc.get("numberValue", wartosc.get("stringValue"))
+
+    # --- Worksheet ---
+    def get_all_records(self):
+        self.zapytania.append("get_all_records")
+        naglowek = self.wiersze[0]
+        return [dict(zip(naglowek, w)) for w in self.wiersze[1:]]
+
+    def col_values(self, kolumna, value_render_option=None):
+        self.zapytania.append("col_values")
+        wartosci = [w[kolumna - 1] if len(w) >= kolumna else "" for w in self.wiersze]
+        while wartosci and wartosci[-1] in ("", None):
+            wartosci.pop()
+        return wartosci
+
+    def update(self, wartosci, *args, **kwargs):
+        self.zapytania.append("update")
+        for i, w in enumerate(wartosci):
+            if i < len(self.wiersze):
+                self.wiersze[i] = list(w)
+            else:
+                self.wiersze.append(list(w))
+        self._zmiana()
+
+    def batch_clear(self, zakresy):
+        self.zapytania.append("batch_clear")
+        od = int(zakresy[0].split(":")[0][1:]) - 1
+        del self.wiersze[od:]
+        self._zmiana()
+
+    def append_rows(self, wartosci, **kwargs):
+        self.zapytania.append("append_rows")
+        self.wiersze.extend(list(w) for w in wartosci)
+        self._zmiana()
+
+
+def blad_serwera(kod):
+    """gspread.exceptions.APIError z danym kodem HTTP (jak z odpowiedzi Google)."""
+    odpowiedz = types.SimpleNamespace(
+        json=lambda: {"error": {"code": kod, "message": "Service Unavailable", "status": "UNAVAILABLE"}},
+        text="",
+    )
+    return gspread.exceptions.APIError(odpowiedz)
+
+
+class FakeKlient:
+    def __init__(self, arkusz):
+        self.arkusz = arkusz
+        auth = types.SimpleNamespace(valid=True, expiry=None)
+        self.http_client = types.SimpleNamespace(
+            auth=auth, login=lambda: None, session=types.SimpleNamespace(hooks={'response': []}),
+        )
+
+    def open_by_url(self, url):
+        self.arkusz.zapytania.append("open_by_url")
+        return self.arkusz
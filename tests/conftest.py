@@ -0,0 +1,94 @@
+import logging
+import threading
+import types
+
+import pandas as pd
+import pytest
+
+from budzet import magazyn, schemat
+from budzet.arkusz import PolaczenieArkusza
+from tests.atrapy import FakeArkusz, FakeKlient
+
+# Poza `streamlit run` cache Streamlit ostrzega przy każdym wywołaniu
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+def wiersze_startowe(liczba=10):
+    """Arkusz "dane" z nagłówkiem KOLUMNY i transakcjami o ID 1..liczba."""
+    wiersze = [list(schemat.KOLUMNY)]
+    for i in range(1, liczba + 1):
+        bank = schemat.LISTA_BANKOW[i % 2]
+        wiersze.append([i, f"2024-0{1 + i % 3}-{10 + i}", "Paliwo", f"ORLEN {i}", -10.5 * i, bank])
+    return wiersze
+
+
+def stan_arkusza(arkusz):
+    """Zawartość atrapy w postaci _do_eksportu (do porównań)."""
+    return magazyn._do_eksportu(magazyn._parsuj_arkusz(arkusz.get_all_records()))
+
+
+def eksport(wiersze):
+    """Lista wierszy (bez nagłówka) -> ramka w postaci _do_eksportu."""
+    return magazyn._do_eksportu(pd.DataFrame(wiersze, columns=schemat.KOLUMNY))
+
+
+def baza():
+    """Stan startowego arkusza w postaci _do_eksportu."""
+    return eksport(wiersze_startowe()[1:])
+
+
+def zmien(df, id_wiersza, **pola):
+    """Kopia `df` ze zmienionymi polami wiersza o danym ID."""
+    df = df.copy()
+    for kolumna, wartosc in pola.items():
+        df.loc[df['id'] == id_wiersza, kolumna] = wartosc
+    return df
+
+
+def wiersz(df, id_wiersza):
+    return df.set_index('id').loc[id_wiersza]
+
+
+def poczekaj(kolejka):
+    """Czeka, aż wątek zapisu opróżni kolejkę (bez nieudanych zapisów)."""
+    for _ in range(500):
+        if not kolejka.zadania:
+            break
+        threading.Event().wait(0.01)
+    assert not kolejka.zadania and not kolejka.nieudane
+
+
+@pytest.fixture(autouse=True)
+def czysty_stan():
+    for zasob in (magazyn.licznik_id, magazyn.migawka_danych, *magazyn.WIDOKI_WERSJI):
+        zasob.clear()
+    yield
+    magazyn.zamknij_zasoby()
+
+
+@pytest.fixture
+def arkusz():
+    return FakeArkusz(wiersze_startowe())
+
+
+@pytest.fixture
+def polaczenie(arkusz):
+    return PolaczenieArkusza(FakeKlient(arkusz))
+
+
+@pytest.fixture
+def lustro(tmp_path, polaczenie):
+    """Lustro zsynchronizowane z atrapą arkusza (bez wątku w tle)."""
+    lustro = magazyn.LustroDanych(str(tmp_path / "lustro.sqlite"))
+    magazyn.synchronizuj_lustro(lustro, polaczenie)
+    return lustro
+
+
+@pytest.fixture
+def kolejka(tmp_path, monkeypatch, polaczenie):
+    """Kolejka z prawdziwym wątkiem zapisu (lustro procesu w tmp_path), bez przerw między ponowieniami."""
+    monkeypatch.setattr(magazyn, 'LUSTRO_SCIEZKA', str(tmp_path / "lustro.sqlite"))
+    monkeypatch.setattr(magazyn, 'get_polaczenie', lambda: polaczenie)
+    monkeypatch.setattr(magazyn, 'time', types.SimpleNamespace(sleep=lambda przerwa: None))
+    magazyn.synchronizuj_lustro(magazyn.get_lustro(), polaczenie)
+    return magazyn.get_kolejka_zapisu()
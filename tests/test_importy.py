@@ -0,0 +1,44 @@
+"""Import kilku wyciągów: pula procesów i powrót do parsowania po kolei."""
+import os
+
+import pytest
+
+from budzet import importy, schemat
+from benchmark import wyciag_ing, wyciag_mbank
+
+
+def wyciagi():
+    return [("ing.csv", wyciag_ing(50).getvalue()), ("mbank.csv", wyciag_mbank(40, ["Paliwo"]).getvalue())]
+
+
+@pytest.mark.parametrize("wyciag", [wyciag_ing, lambda n: wyciag_mbank(n, ["Paliwo"])])
+def test_paczki_wyciagu_w_zwartych_typach(wyciag):
+    # Wielokrotność paczki - ostatnia paczka ma samą stopkę
+    dane = importy.przetworz_csv(wyciag(2 * importy.ROZMIAR_PACZKI_CSV))
+    assert len(dane) == 2 * importy.ROZMIAR_PACZKI_CSV
+    assert list(dane.columns) == importy.KOLUMNY_IMPORTU + ['bank']
+    assert dane['opis'].dtype == schemat.TYP_OPISU and dane['kategoria'].dtype == schemat.TYP_OPISU
+
+
+def test_male_wyciagi_bez_puli_procesow(monkeypatch):
+    def bez_puli():
+        raise AssertionError("małe pliki nie powinny uruchamiać puli")
+    monkeypatch.setattr(importy, 'get_pula_importu', bez_puli)
+    dane = importy.przetworz_wyciagi(wyciagi())
+    assert [p['transakcje'] for p in dane.attrs['pliki']] == [50, 40]
+
+
+def test_zepsuta_pula_jest_zamykana_a_import_idzie_po_kolei(monkeypatch):
+    monkeypatch.setattr(importy, 'IMPORT_MIN_BAJTOW_PULI', 0)
+    importy.get_pula_importu.clear()
+    pula = importy.get_pula_importu()
+    # Proces z puli ginie (jak zabity przy braku pamięci) - pula jest odtąd zepsuta
+    with pytest.raises(importy.BrokenProcessPool):
+        pula.submit(os._exit, 1).result()
+
+    dane = importy.przetworz_wyciagi(wyciagi())
+    assert [p['transakcje'] for p in dane.attrs['pliki']] == [50, 40]
+    nowa = importy.get_pula_importu()
+    assert nowa is not pula
+    nowa.shutdown()
+    importy.get_pula_importu.clear()
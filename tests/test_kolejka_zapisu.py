@@ -0,0 +1,149 @@
+"""KolejkaZapisu.dodaj / naloz i zapis przez _zapisz_w_arkuszu przy równoległych edycjach."""
+from budzet import magazyn
+from tests.conftest import baza, eksport, poczekaj, stan_arkusza, wiersz, zmien
+
+
+def test_kolejne_edycje_dwoch_sesji_lacza_sie_w_jedno_zadanie():
+    kolejka = magazyn.KolejkaZapisu()
+    kolejka.dodaj('zapis', zmien(baza(), 2, opis="SESJA A"), baza())
+    # Druga sesja edytowała starsze dane - nie widziała zmiany A
+    kolejka.dodaj('zapis', zmien(baza(), 8, opis="SESJA B"), baza())
+    assert len(kolejka.zadania) == 1
+    dane = kolejka.zadania[0]['dane']
+    assert wiersz(dane, 2)['opis'] == "SESJA A"
+    assert wiersz(dane, 8)['opis'] == "SESJA B"
+
+
+def test_usuniecie_w_drugiej_sesji_nie_cofa_edycji_pierwszej():
+    kolejka = magazyn.KolejkaZapisu()
+    kolejka.dodaj('zapis', zmien(baza(), 2, opis="SESJA A"), baza())
+    kolejka.dodaj('zapis', baza()[baza()['id'] != 9], baza())
+    dane = kolejka.zadania[0]['dane']
+    assert wiersz(dane, 2)['opis'] == "SESJA A"
+    assert 9 not in set(dane['id'])
+
+
+def test_dopisania_lacza_sie_a_zadanie_w_toku_nie():
+    kolejka = magazyn.KolejkaZapisu()
+    kolejka.dodaj('dopisz', eksport([[11, "2024-03-01", "Paliwo", "A", -1.0, "ING"]]))
+    kolejka.dodaj('dopisz', eksport([[12, "2024-03-01", "Paliwo", "B", -2.0, "ING"]]))
+    assert len(kolejka.zadania) == 1 and list(kolejka.zadania[0]['dane']['id']) == [11, 12]
+    kolejka.pobierz()
+    kolejka.dodaj('dopisz', eksport([[13, "2024-03-01", "Paliwo", "C", -3.0, "ING"]]))
+    assert len(kolejka.zadania) == 2
+
+
+def test_naloz_pokazuje_zmiany_z_kolejki_i_nie_dubluje_zapisanych():
+    kolejka = magazyn.KolejkaZapisu()
+    kolejka.dodaj('zapis', zmien(baza(), 2, opis="SESJA A"), baza())
+    kolejka.dodaj('dopisz', eksport([[11, "2024-03-01", "Paliwo", "NOWY", -1.0, "ING"]]))
+    widok = magazyn._do_eksportu(kolejka.naloz(baza()))
+    assert wiersz(widok, 2)['opis'] == "SESJA A"
+    assert list(widok['id']) == list(range(1, 12))
+
+    # Zadania już w arkuszu i lustrze, a jeszcze w kolejce - drugi raz niczego nie dokładają
+    po_zapisie = widok.copy()
+    assert magazyn._do_eksportu(kolejka.naloz(po_zapisie)).equals(po_zapisie)
+
+
+def test_zapis_nanosi_zmiany_na_to_co_ktos_zapisal_w_miedzyczasie(arkusz, polaczenie, lustro):
+    baza_sesji = magazyn._do_eksportu(lustro.wczytaj())
+    # Ktoś inny zmienia wiersz 3 i usuwa wiersz 6 bezpośrednio w arkuszu
+    arkusz.wiersze[3][3] = "ICH OPIS"
+    del arkusz.wiersze[6]
+    arkusz._zmiana()
+
+    moje = zmien(baza_sesji, 8, kwota=-1.0)
+    df_stan, rewizja, naglowek, konflikty = magazyn._zapisz_w_arkuszu(polaczenie, lustro, moje, df_bazowy=baza_sesji)
+    lustro.synchronizuj(df_stan, rewizja, naglowek)
+
+    w_arkuszu = stan_arkusza(arkusz)
+    assert konflikty == []
+    assert w_arkuszu.equals(magazyn._do_eksportu(lustro.wczytaj()))
+    assert wiersz(w_arkuszu, 3)['opis'] == "ICH OPIS"
+    assert wiersz(w_arkuszu, 8)['kwota'] == -1.0
+    assert 6 not in set(w_arkuszu['id'])
+
+
+def test_konflikty_widzi_i_potwierdza_tylko_wlasna_sesja():
+    kolejka = magazyn.KolejkaZapisu()
+    kolejka.dodaj('zapis', zmien(baza(), 3, opis="SESJA A"), baza(), sesja="A")
+    kolejka.dodaj('zapis', zmien(baza(), 3, opis="SESJA B"), baza(), sesja="B")
+    assert kolejka.konflikty_sesji("A") == []
+    assert len(kolejka.konflikty_sesji("B")) == 1
+    kolejka.potwierdz_konflikty("A")
+    assert len(kolejka.konflikty_sesji("B")) == 1
+    kolejka.potwierdz_konflikty("B")
+    assert kolejka.konflikty_sesji("B") == []
+
+
+def test_odrzucenie_nieudanego_zapisu_nie_gubi_zmian_innej_sesji():
+    kolejka = magazyn.KolejkaZapisu()
+    kolejka.dodaj('zapis', zmien(baza(), 2, opis="SESJA A"), baza(), sesja="A")
+    kolejka.dodaj('zapis', zmien(baza(), 8, opis="SESJA B"), baza(), sesja="B")
+    kolejka.dodaj('dopisz', eksport([[11, "2024-03-01", "Paliwo", "C", -1.0, "ING"]]), sesja="C")
+    for zadanie in list(kolejka.zadania):
+        kolejka.odloz(zadanie, "503")
+    assert len(kolejka.nieudane_sesji("A")) == 1 and len(kolejka.nieudane_sesji("C")) == 1
+
+    kolejka.odrzuc_nieudane("A")
+    assert kolejka.nieudane_sesji("A") == []
+    assert len(kolejka.nieudane_sesji("B")) == 1
+
+    kolejka.ponow_nieudane("B")
+    assert len(kolejka.zadania) == 1 and wiersz(kolejka.zadania[0]['dane'], 8)['opis'] == "SESJA B"
+    assert len(kolejka.nieudane_sesji("C")) == 1
+
+
+def test_ponowienie_dopisania_ktore_doszlo_mimo_503_nie_dubluje(arkusz, kolejka):
+    arkusz.awaria_po = "append_rows"
+    kolejka.dodaj('dopisz', eksport([[11, "2024-03-01", "Paliwo", "JEDEN WIERSZ", -5.0, "ING"]]))
+    poczekaj(kolejka)
+    w_arkuszu = stan_arkusza(arkusz)
+    assert list(w_arkuszu['opis']).count("JEDEN WIERSZ") == 1
+    assert list(w_arkuszu['id']) == list(range(1, 12))
+
+
+def test_ponowienie_zachowuje_id_nadane_przy_pierwszej_probie(arkusz, kolejka):
+    # Ktoś zajął ID 11 innym wierszem - nasz dostaje nowe ID, a ponowienie ma je zachować
+    arkusz.wiersze.append([11, "2024-03-02", "Rozrywka", "ICH WIERSZ", -7.0, "mBank"])
+    arkusz._zmiana()
+    arkusz.awaria_po = "append_rows"
+    kolejka.dodaj('dopisz', eksport([[11, "2024-03-01", "Paliwo", "JEDEN WIERSZ", -5.0, "ING"]]))
+    poczekaj(kolejka)
+    w_arkuszu = stan_arkusza(arkusz)
+    assert list(w_arkuszu['opis']).count("JEDEN WIERSZ") == 1
+    assert w_arkuszu['id'].is_unique
+    assert wiersz(w_arkuszu, 11)['opis'] == "ICH WIERSZ"
+
+
+def test_ponowienie_zapisu_z_edytora_ktory_doszedl_mimo_503_nie_dubluje(arkusz, kolejka):
+    moje = eksport(baza().values.tolist() + [[11, "2024-03-01", "Paliwo", "EDYTOR NOWY", -5.0, "ING"]])
+    moje = zmien(moje, 2, opis="ZMIENIONY")
+    arkusz.awaria_po = "batch_update"
+    kolejka.dodaj('zapis', moje, baza())
+    poczekaj(kolejka)
+    w_arkuszu = stan_arkusza(arkusz)
+    assert list(w_arkuszu['opis']).count("EDYTOR NOWY") == 1
+    assert list(w_arkuszu['id']) == list(range(1, 12))
+    assert wiersz(w_arkuszu, 2)['opis'] == "ZMIENIONY"
+
+
+def test_sortowanie_arkusza_w_trakcie_zapisu_wymusza_pelne_pobranie(arkusz, kolejka):
+    def sortuj(arkusz):
+        arkusz.wiersze[1:] = sorted(arkusz.wiersze[1:], key=lambda w: -w[0])
+        arkusz._zmiana()
+
+    arkusz.po_zapisie = sortuj
+    kolejka.dodaj('zapis', zmien(baza(), 2, opis="PIERWSZA"), baza())
+    poczekaj(kolejka)
+    lustro = magazyn.get_lustro()
+    assert magazyn._do_eksportu(lustro.wczytaj()).equals(stan_arkusza(arkusz))
+
+    # Kolejna delta adresuje wiersze według nowych pozycji
+    kolejka.dodaj('zapis', zmien(stan_arkusza(arkusz), 9, opis="DRUGA"), stan_arkusza(arkusz))
+    poczekaj(kolejka)
+    w_arkuszu = stan_arkusza(arkusz)
+    assert wiersz(w_arkuszu, 9)['opis'] == "DRUGA"
+    assert wiersz(w_arkuszu, 2)['opis'] == "PIERWSZA"
+    assert list(w_arkuszu['opis']).count("DRUGA") == 1
@@ -0,0 +1,34 @@
+"""Widoki wersji (kostka, odciski, indeks dat) pochodzą z tej samej migawki co dane strony."""
+from budzet import agregacje, magazyn, schemat
+from tests.conftest import eksport
+
+
+def posortowana(kostka):
+    return kostka.sort_values(agregacje.KLUCZ_KOSTKI).reset_index(drop=True)[['miesiac', 'kategoria', 'bank', 'suma', 'liczba']]
+
+
+def test_kostka_i_odciski_z_lustra_gdy_jest_w_stanie_migawki(kolejka):
+    df, wersja = magazyn.dane_strony()
+    assert df.attrs['czyste_lustro'] == magazyn.get_lustro().wersja
+    assert posortowana(magazyn.wczytaj_kostke(wersja)).equals(posortowana(agregacje.kostka_wydatkow(df)))
+
+
+def test_lustro_nowsze_niz_migawka_nie_trafia_do_jej_widokow(arkusz, polaczenie, kolejka):
+    df, wersja = magazyn.dane_strony()
+    # Zanim strona poprosi o kostkę i odciski, lustro dogania zmianę w arkuszu
+    arkusz.wiersze[1][4] = -1000.0
+    arkusz._zmiana()
+    assert magazyn.synchronizuj_lustro(magazyn.get_lustro(), polaczenie)
+
+    kostka = magazyn.wczytaj_kostke(wersja)
+    assert posortowana(kostka).equals(posortowana(agregacje.kostka_wydatkow(df)))
+    odciski = magazyn.wczytaj_odciski(wersja)
+    assert odciski.sort_index().equals(schemat.odciski_transakcji(df).value_counts().sort_index())
+
+
+def test_zmiany_z_kolejki_sa_w_kostce_migawki(kolejka):
+    kolejka.zamknij()   # zadanie ma zostać w kolejce
+    kolejka.dodaj('dopisz', eksport([[11, "2024-03-01", "Paliwo", "NOWY", -5.0, "ING"]]))
+    df, wersja = magazyn.dane_strony()
+    assert df.attrs['czyste_lustro'] is None
+    assert magazyn.wczytaj_kostke(wersja)['liczba'].sum() == len(df) == 11
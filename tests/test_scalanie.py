@@ -0,0 +1,99 @@
+"""scal_trojstronnie, zbuduj_zadania_delta i stan_po_delcie."""
+from budzet import magazyn
+from tests.atrapy import FakeArkusz
+from tests.conftest import baza, eksport, stan_arkusza, wiersz, wiersze_startowe, zmien
+
+
+def test_edycje_roznych_wierszy_lacza_sie():
+    moje = zmien(baza(), 2, opis="MOJ OPIS")
+    serwer = zmien(baza(), 7, kategoria="Rozrywka")
+    wynik, konflikty = magazyn.scal_trojstronnie(baza(), moje, serwer)
+    assert konflikty == []
+    assert wiersz(wynik, 2)['opis'] == "MOJ OPIS"
+    assert wiersz(wynik, 7)['kategoria'] == "Rozrywka"
+    assert len(wynik) == 10
+
+
+def test_edycje_roznych_kolumn_tego_samego_wiersza_lacza_sie():
+    moje = zmien(baza(), 3, opis="MOJ OPIS")
+    serwer = zmien(baza(), 3, kwota=-99.0)
+    wynik, konflikty = magazyn.scal_trojstronnie(baza(), moje, serwer)
+    assert konflikty == []
+    assert wiersz(wynik, 3)['opis'] == "MOJ OPIS"
+    assert wiersz(wynik, 3)['kwota'] == -99.0
+
+
+def test_ta_sama_komorka_to_konflikt_wygrywa_serwer():
+    moje = zmien(baza(), 3, opis="MOJ OPIS")
+    serwer = zmien(baza(), 3, opis="ICH OPIS")
+    wynik, konflikty = magazyn.scal_trojstronnie(baza(), moje, serwer)
+    assert wiersz(wynik, 3)['opis'] == "ICH OPIS"
+    assert len(konflikty) == 1 and "ID 3, opis" in konflikty[0]
+
+
+def test_ta_sama_zmiana_u_obu_to_nie_konflikt():
+    moje = zmien(baza(), 3, opis="TEN SAM")
+    serwer = zmien(baza(), 3, opis="TEN SAM")
+    wynik, konflikty = magazyn.scal_trojstronnie(baza(), moje, serwer)
+    assert konflikty == []
+    assert wiersz(wynik, 3)['opis'] == "TEN SAM"
+
+
+def test_usuniecie_wiersza_zmienionego_przez_innych_nie_usuwa_go():
+    moje = baza()[baza()['id'] != 4]
+    serwer = zmien(baza(), 4, opis="ICH OPIS")
+    wynik, konflikty = magazyn.scal_trojstronnie(baza(), moje, serwer)
+    assert wiersz(wynik, 4)['opis'] == "ICH OPIS"
+    assert len(konflikty) == 1
+
+
+def test_edycja_wiersza_usunietego_przez_innych_przepada():
+    moje = zmien(baza(), 4, opis="MOJ OPIS")
+    serwer = baza()[baza()['id'] != 4]
+    wynik, konflikty = magazyn.scal_trojstronnie(baza(), moje, serwer)
+    assert 4 not in set(wynik['id'])
+    assert len(konflikty) == 1 and "usunięty" in konflikty[0]
+
+
+def test_nowy_wiersz_z_zajetym_id_dostaje_nowe_id():
+    moje = eksport(wiersze_startowe()[1:] + [[11, "2024-03-01", "Paliwo", "MOJ NOWY", -5.0, "ING"]])
+    serwer = eksport(wiersze_startowe()[1:] + [[11, "2024-03-02", "Rozrywka", "ICH NOWY", -7.0, "mBank"]])
+    wynik, konflikty = magazyn.scal_trojstronnie(baza(), moje, serwer)
+    assert konflikty == []
+    assert wynik['id'].is_unique
+    assert wiersz(wynik, 11)['opis'] == "ICH NOWY"
+    assert set(wynik.loc[wynik['id'] > 11, 'opis']) == {"MOJ NOWY"}
+
+
+def wykonaj_delte(df_nowe):
+    """Wysyła deltę do atrapy i zwraca (stan arkusza, stan przewidziany przez stan_po_delcie)."""
+    arkusz = FakeArkusz(wiersze_startowe())
+    zadania = magazyn.zbuduj_zadania_delta(baza(), df_nowe, arkusz.id, arkusz.wiersze[0])
+    arkusz.batch_update({"requests": zadania})
+    return stan_arkusza(arkusz), magazyn.stan_po_delcie(baza(), df_nowe)
+
+
+def test_delta_usuwa_wiersze_ponizej_edycji():
+    nowe = zmien(baza(), 2, opis="ZMIENIONY")
+    nowe = nowe[~nowe['id'].isin([5, 6, 9])]
+    w_arkuszu, przewidziany = wykonaj_delte(nowe)
+    assert w_arkuszu.equals(przewidziany)
+    assert list(w_arkuszu['id']) == [1, 2, 3, 4, 7, 8, 10]
+    assert wiersz(w_arkuszu, 2)['opis'] == "ZMIENIONY"
+    assert wiersz(w_arkuszu, 8)['opis'] == "ORLEN 8"
+
+
+def test_delta_edycja_ponizej_usunietych_trafia_we_wlasciwy_wiersz():
+    nowe = zmien(baza(), 9, kwota=-1.25)
+    nowe = nowe[~nowe['id'].isin([1, 2])]
+    nowe = eksport(nowe.values.tolist() + [[11, "2024-03-01", "Paliwo", "NOWY", -5.0, "ING"]])
+    w_arkuszu, przewidziany = wykonaj_delte(nowe)
+    assert w_arkuszu.equals(przewidziany)
+    assert wiersz(w_arkuszu, 9)['kwota'] == -1.25
+    assert wiersz(w_arkuszu, 10)['kwota'] == -105.0
+    assert list(w_arkuszu['id'])[-1] == 11
+
+
+def test_delta_odmawia_przy_zdublowanych_id():
+    nowe = eksport(wiersze_startowe()[1:] + [[3, "2024-03-01", "Paliwo", "DUBEL", -5.0, "ING"]])
+    assert magazyn.zbuduj_zadania_delta(baza(), nowe, 0, wiersze_startowe()[0]) is None